@@ -0,0 +1,303 @@
+import argparse
+import datetime
+import gzip
+import hashlib
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import threading
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DB = os.path.join(BASE_DIR, "Question_DB.db")
+DEFAULT_BACKUP_DIR = os.path.join(BASE_DIR, "Backup")
+
+# Pages copied per backup step. Between steps the source is unlocked, so an editor
+# saving at the same time waits at most one step rather than the whole copy.
+PAGES_PER_STEP = 64
+STEP_SLEEP = 0.005
+
+# Snapshots kept by prune(): the newest KEEP_LAST, plus the newest of each of the last
+# KEEP_DAILY days and KEEP_WEEKLY weeks
+KEEP_LAST = 10
+KEEP_DAILY = 7
+KEEP_WEEKLY = 4
+
+TIMESTAMP_FORMAT = "%Y-%m-%d_%H%M%S"
+# Only files named like this are snapshots; hand-made copies in the folder are never touched.
+# A second snapshot taken within the same second gets a -2, -3, ... suffix.
+SNAPSHOT_PATTERN = re.compile(
+    r"^(?P<stem>.+)_Backup_(?P<time>\d{4}-\d{2}-\d{2}_\d{6})(?:-(?P<seq>\d+))?\.db(?P<gz>\.gz)?$")
+
+def file_hash(path):
+    """Return the sha256 of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def check_integrity(db_path):
+    """Run PRAGMA integrity_check on a database file and return its result ('ok' if intact)."""
+    conn = sqlite3.connect(db_path)
+    try:
+        return "\n".join(row[0] for row in conn.execute("PRAGMA integrity_check"))
+    finally:
+        conn.close()
+
+def list_snapshots(backup_dir=DEFAULT_BACKUP_DIR, stem=None):
+    """Return (time, path) of every snapshot in backup_dir, newest first."""
+    snapshots = []
+    for filename in os.listdir(backup_dir) if os.path.isdir(backup_dir) else []:
+        match = SNAPSHOT_PATTERN.match(filename)
+        if match and (stem is None or match.group("stem") == stem):
+            taken = datetime.datetime.strptime(match.group("time"), TIMESTAMP_FORMAT)
+            snapshots.append((taken, int(match.group("seq") or 1), os.path.join(backup_dir, filename)))
+    return [(taken, path) for taken, _, path in sorted(snapshots, reverse=True)]
+
+def read_recorded_hash(snapshot_path):
+    """Return the sha256 of the uncompressed database recorded next to a snapshot, or None."""
+    try:
+        with open(f"{snapshot_path}.sha256") as f:
+            return f.read().split()[0]
+    except (OSError, IndexError):
+        return None
+
+def reserve_snapshot_path(backup_dir, stem, compress):
+    """Create an empty file under a snapshot name no other snapshot has, and return its path."""
+    timestamp = datetime.datetime.now().strftime(TIMESTAMP_FORMAT)
+    extension = ".db.gz" if compress else ".db"
+    seq = 1
+    while True:
+        suffix = f"-{seq}" if seq > 1 else ""
+        path = os.path.join(backup_dir, f"{stem}_Backup_{timestamp}{suffix}{extension}")
+        try:
+            # O_EXCL fails if the name is taken, even by a backup running in another process
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return path
+        except FileExistsError:
+            seq += 1
+
+def backup(db_path=DEFAULT_DB, backup_dir=DEFAULT_BACKUP_DIR, compress=True,
+           pages=PAGES_PER_STEP, sleep=STEP_SLEEP, progress=None):
+    """Take a consistent snapshot of a live database into backup_dir.
+
+    Uses SQLite's online backup API in steps of pages pages, so the database stays
+    usable while it is copied, and restarts on its own if it is written to meanwhile.
+    Each snapshot must pass PRAGMA integrity_check, and its sha256 is stored next to
+    it. If the database has not changed since the newest snapshot, no new one is
+    written. Returns the path of the new snapshot, or None if nothing changed.
+
+    Every snapshot is a full (compressed) copy; skipping unchanged databases is the
+    only incremental part. Page-level deltas would make each restore depend on a
+    chain of files, and the gzipped question database is small enough to keep whole.
+    An existing snapshot is never overwritten. Raises sqlite3.OperationalError if
+    db_path cannot be opened.
+    """
+    os.makedirs(backup_dir, exist_ok=True)
+    stem = os.path.splitext(os.path.basename(db_path))[0]
+    # Read-only, so a mistyped path raises instead of creating and backing up an empty database
+    source = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{stem}_", suffix=".tmp", dir=backup_dir)
+    os.close(fd)
+    try:
+        try:
+            target = sqlite3.connect(tmp_path)
+            try:
+                source.backup(target, pages=pages, progress=progress, sleep=sleep)
+                # A WAL source would leave the copy in WAL mode; make it a self-contained file
+                target.execute("PRAGMA journal_mode=DELETE")
+            finally:
+                target.close()
+        finally:
+            source.close()
+
+        result = check_integrity(tmp_path)
+        if result != "ok":
+            raise sqlite3.DatabaseError(f"Backup of {db_path} failed its integrity check: {result}")
+
+        content_hash = file_hash(tmp_path)
+        snapshots = list_snapshots(backup_dir, stem)
+        if snapshots and read_recorded_hash(snapshots[0][1]) == content_hash:
+            return None
+
+        if compress:
+            with open(tmp_path, "rb") as src, gzip.open(f"{tmp_path}.gz", "wb", compresslevel=6) as dst:
+                shutil.copyfileobj(src, dst, 1 << 20)
+        snapshot_path = reserve_snapshot_path(backup_dir, stem, compress)
+        try:
+            os.replace(f"{tmp_path}.gz" if compress else tmp_path, snapshot_path)
+        except OSError:
+            os.remove(snapshot_path)
+            raise
+        with open(f"{snapshot_path}.sha256", "w") as f:
+            f.write(f"{content_hash}  {os.path.basename(db_path)}\n")
+        return snapshot_path
+    finally:
+        for path in (tmp_path, f"{tmp_path}.gz"):
+            if os.path.exists(path):
+                os.remove(path)
+
+def verify_snapshot(snapshot_path):
+    """Check a snapshot: it decompresses, matches its recorded sha256 and passes integrity_check.
+
+    Returns (ok, message).
+    """
+    if not snapshot_path.endswith(".gz"):
+        db_path, tmp_path = snapshot_path, None
+    else:
+        db_path = tmp_path = f"{snapshot_path}.{os.getpid()}.verify"
+    try:
+        if tmp_path:
+            try:
+                with gzip.open(snapshot_path, "rb") as src, open(tmp_path, "wb") as dst:
+                    shutil.copyfileobj(src, dst, 1 << 20)
+            except (OSError, EOFError) as e:
+                return False, f"cannot decompress: {e}"
+        recorded = read_recorded_hash(snapshot_path)
+        if recorded is None:
+            return False, "no recorded sha256"
+        if file_hash(db_path) != recorded:
+            return False, "sha256 does not match the recorded one"
+        result = check_integrity(db_path)
+        if result != "ok":
+            return False, f"integrity_check: {result}"
+        return True, "ok"
+    finally:
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def restore(snapshot_path, db_path):
+    """Write a verified snapshot to db_path. The database must not be open anywhere."""
+    ok, message = verify_snapshot(snapshot_path)
+    if not ok:
+        raise sqlite3.DatabaseError(f"Not restoring {snapshot_path}: {message}")
+    tmp_path = f"{db_path}.{os.getpid()}.restore"
+    opener = gzip.open if snapshot_path.endswith(".gz") else open
+    with opener(snapshot_path, "rb") as src, open(tmp_path, "wb") as dst:
+        shutil.copyfileobj(src, dst, 1 << 20)
+    # A leftover write-ahead log from the old database would be replayed into the restored one
+    for suffix in ("-wal", "-shm"):
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
+    os.replace(tmp_path, db_path)
+
+def snapshots_to_keep(snapshots, keep_last=KEEP_LAST, keep_daily=KEEP_DAILY, keep_weekly=KEEP_WEEKLY):
+    """Return the paths, out of newest-first (time, path) snapshots, that the retention policy keeps."""
+    keep = {path for _, path in snapshots[:keep_last]}
+    days, weeks = set(), set()
+    for taken, path in snapshots:
+        day = taken.date()
+        if day not in days and len(days) < keep_daily:
+            days.add(day)
+            keep.add(path)
+        week = taken.isocalendar()[:2]
+        if week not in weeks and len(weeks) < keep_weekly:
+            weeks.add(week)
+            keep.add(path)
+    return keep
+
+def prune(backup_dir=DEFAULT_BACKUP_DIR, stem=None, keep_last=KEEP_LAST, keep_daily=KEEP_DAILY,
+          keep_weekly=KEEP_WEEKLY):
+    """Delete snapshots the retention policy does not keep. Returns the deleted paths."""
+    deleted = []
+    for stem_name in {SNAPSHOT_PATTERN.match(os.path.basename(path)).group("stem")
+                      for _, path in list_snapshots(backup_dir, stem)}:
+        snapshots = list_snapshots(backup_dir, stem_name)
+        keep = snapshots_to_keep(snapshots, keep_last, keep_daily, keep_weekly)
+        for _, path in snapshots:
+            if path not in keep:
+                for file_path in (path, f"{path}.sha256"):
+                    if os.path.exists(file_path):
+                        os.remove(file_path)
+                deleted.append(path)
+    return deleted
+
+class BackupScheduler:
+    """Background thread that backs up and prunes a database every interval seconds."""
+
+    def __init__(self, db_path=DEFAULT_DB, interval=30 * 60, backup_dir=DEFAULT_BACKUP_DIR, compress=True,
+                 on_error=None):
+        self.db_path = db_path
+        self.interval = interval
+        self.backup_dir = backup_dir
+        self.compress = compress
+        self.on_error = on_error
+        self.last_snapshot = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="BackupScheduler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, final_backup=True):
+        """Stop the thread, taking one last backup first unless final_backup is False."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        if final_backup:
+            self.run_once()
+
+    def run_once(self):
+        try:
+            snapshot = backup(self.db_path, self.backup_dir, self.compress)
+            if snapshot:
+                self.last_snapshot = snapshot
+            prune(self.backup_dir, os.path.splitext(os.path.basename(self.db_path))[0])
+        except Exception as e:
+            if self.on_error:
+                self.on_error(e)
+            else:
+                print(f"Backup of {self.db_path} failed: {e}")
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.run_once()
+
+def main():
+    parser = argparse.ArgumentParser(description="Online backups of the question database.")
+    parser.add_argument("--db", default=DEFAULT_DB, help="database to back up")
+    parser.add_argument("--dir", default=DEFAULT_BACKUP_DIR, help="folder snapshots are kept in")
+    commands = parser.add_subparsers(dest="command", required=True)
+    backup_parser = commands.add_parser("backup", help="take a snapshot and prune old ones")
+    backup_parser.add_argument("--no-compress", action="store_true", help="store the snapshot uncompressed")
+    commands.add_parser("list", help="list snapshots, newest first")
+    verify_parser = commands.add_parser("verify", help="check snapshots")
+    verify_parser.add_argument("snapshots", nargs="*", help="snapshot files (default: all in --dir)")
+    commands.add_parser("prune", help="delete snapshots outside the retention policy")
+    restore_parser = commands.add_parser("restore", help="replace --db with a snapshot")
+    restore_parser.add_argument("snapshot")
+    schedule_parser = commands.add_parser("schedule", help="back up every few minutes until interrupted")
+    schedule_parser.add_argument("--every", type=float, default=30, help="minutes between backups")
+    args = parser.parse_args()
+
+    if args.command == "backup":
+        snapshot = backup(args.db, args.dir, compress=not args.no_compress)
+        print(f"Saved {snapshot}" if snapshot else "Database unchanged since the last snapshot")
+        for path in prune(args.dir):
+            print(f"Deleted {path}")
+    elif args.command == "list":
+        for taken, path in list_snapshots(args.dir):
+            print(f"{taken:%Y-%m-%d %H:%M:%S}  {os.path.getsize(path):>10} bytes  {path}")
+    elif args.command == "verify":
+        for path in args.snapshots or [path for _, path in list_snapshots(args.dir)]:
+            ok, message = verify_snapshot(path)
+            print(f"{'OK ' if ok else 'BAD'} {path} ({os.path.getsize(path)} bytes){'' if ok else ': ' + message}")
+    elif args.command == "prune":
+        for path in prune(args.dir):
+            print(f"Deleted {path}")
+    elif args.command == "restore":
+        restore(args.snapshot, args.db)
+        print(f"Restored {args.db} from {args.snapshot}")
+    elif args.command == "schedule":
+        scheduler = BackupScheduler(args.db, args.every * 60, args.dir).start()
+        try:
+            scheduler._thread.join()
+        except KeyboardInterrupt:
+            scheduler.stop()
+
+if __name__ == "__main__":
+    main()
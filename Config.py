@@ -0,0 +1,88 @@
+import os
+
+# Where the quiz and the editor find their files. Each setting is looked up in order:
+#
+#   1. a command-line flag (--db, --images, --bundle, --progress), see parse_args()
+#   2. an environment variable (QUIZ_DB, QUIZ_IMAGES, QUIZ_BUNDLE, QUIZ_PROGRESS)
+#   3. the [paths] section of the config file: quiz.ini next to this file, or the
+#      file named by --config or QUIZ_CONFIG
+#   4. the default below
+#
+# Relative paths from a flag or environment variable are taken relative to the current
+# folder, as the shell would; those in a config file relative to the file's folder. The
+# defaults are in the project folder.
+# Only the image folder falls back to asking the user, and only when it does not exist.
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CONFIG = os.path.join(BASE_DIR, "quiz.ini")
+
+SETTINGS = {
+    # name: (environment variable, default)
+    "db": ("QUIZ_DB", "Question_DB.db"),
+    "images": ("QUIZ_IMAGES", "Source_img"),
+    "bundle": ("QUIZ_BUNDLE", "quiz_bundle.qzb"),
+    "progress": ("QUIZ_PROGRESS", "Learner_Progress.db"),
+}
+
+_overrides = {}
+_file_settings = None
+
+def config_path():
+    return _overrides.get("config") or os.environ.get("QUIZ_CONFIG") or DEFAULT_CONFIG
+
+def read_config_file():
+    """Return the [paths] settings of the config file, with paths made absolute; {} if there is none."""
+    global _file_settings
+    if _file_settings is None:
+        path = config_path()
+        _file_settings = {}
+        if os.path.exists(path):
+            import configparser
+            parser = configparser.ConfigParser()
+            parser.read(path)
+            if parser.has_section("paths"):
+                folder = os.path.dirname(os.path.abspath(path))
+                _file_settings = {name: os.path.join(folder, value) for name, value in parser.items("paths")
+                                  if name in SETTINGS}
+    return _file_settings
+
+def get(name):
+    """Return the configured path for a setting (see SETTINGS)."""
+    env_var, default = SETTINGS[name]
+    value = _overrides.get(name) or os.environ.get(env_var) or read_config_file().get(name)
+    return os.path.abspath(value) if value else os.path.join(BASE_DIR, default)
+
+def override(name, value):
+    """Override a setting for the rest of the process, as a command-line flag does."""
+    global _file_settings
+    _overrides[name] = value
+    if name == "config":
+        _file_settings = None
+
+def parse_args(description=None, argv=None, parser=None):
+    """Read --config, --db, --images, --bundle and --progress from the command line. Returns the parsed arguments.
+
+    Pass parser to add these flags to a parser that already has the program's own.
+    """
+    import argparse
+    parser = parser or argparse.ArgumentParser(description=description)
+    parser.add_argument("--config", help=f"settings file (default {DEFAULT_CONFIG})")
+    parser.add_argument("--db", help="question database")
+    parser.add_argument("--images", help="folder with the question screenshots")
+    parser.add_argument("--bundle", help="compiled quiz bundle (see QuizBundle.py)")
+    parser.add_argument("--progress", help="database of each learner's spaced-repetition progress")
+    args = parser.parse_args(argv)
+    for name in ("config", *SETTINGS):
+        if getattr(args, name):
+            override(name, getattr(args, name))
+    return args
+
+def image_folder(parent=None):
+    """Return the image folder, asking the user for one if the configured folder does not exist."""
+    folder = get("images")
+    if not os.path.isdir(folder):
+        from tkinter import filedialog
+        chosen = filedialog.askdirectory(title="Select Image Folder", parent=parent)
+        if chosen:
+            override("images", chosen)
+            folder = chosen
+    return folder
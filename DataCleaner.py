@@ -1,52 +1,39 @@
-import sqlite3
 import tkinter as tk
-from tkinter import ttk, messagebox, filedialog
-from PIL import Image, ImageTk
+from tkinter import messagebox
 import os
 
-# Configurable database and image folder
-db_name = "Question_DB.db"
-image_folder = filedialog.askdirectory(title="Select Image Folder")
+import Config
+import ImagePrefetcher
+import SaveQueue
+
+# How often the editor checks for finished background saves
+SAVE_POLL_MS = 100
+
+# Database access goes through one shared repository (a long-lived connection per thread)
+# The database and image folder come from Config (flags, environment, quiz.ini)
+def repository():
+    # Imported on first use, like PIL and the image code, so this module imports headless
+    import Database
+    return Database.get_repository(Config.get("db"))
 
-# Database connection
 def get_questions():
-    conn = sqlite3.connect(db_name)
-    cursor = conn.cursor()
-    cursor.execute("SELECT ImageText.id, ImageText.filename, text FROM ImageText JOIN CleanedData on CleanedData.question_id = ImageText.id ORDER BY fixed ASC, ImageText.id ASC")
-    data = cursor.fetchall()
-    conn.close()
-    return data
+    return repository().get_questions()
 
 # Update cleaned text and answers
 def update_question(question_id, cleaned_text, answers):
-    conn = sqlite3.connect(db_name)
-    try:
-        cursor = conn.cursor()
-        cursor.execute("UPDATE ImageText SET text = ? WHERE id = ?", (cleaned_text, question_id))
-        
-        correct_answers = '|'.join([answer_text for answer_text, is_correct in answers if is_correct])
-        answer1, answer2, answer3, answer4 = [answer_text for answer_text, _ in answers]
-        
-        cursor.execute("""
-            UPDATE CleanedData
-            SET cleaned_question = ?, answer1 = ?, answer2 = ?, answer3 = ?, answer4 = ?, correct = ?, fixed = 1
-            WHERE question_id = ?
-        """, (cleaned_text, answer1, answer2, answer3, answer4, correct_answers, question_id))
-        
-        conn.commit()
-    except Exception as e:
-        raise e
-    finally:
-        conn.close()
+    repository().update_question(question_id, cleaned_text, answers)
 
 # Get the count of questions that need to be fixed
 def get_unfixed_count():
-    conn = sqlite3.connect(db_name)
-    cursor = conn.cursor()
-    cursor.execute("SELECT COUNT(id) FROM CleanedData WHERE fixed IS NULL")
-    count = cursor.fetchone()[0]
-    conn.close()
-    return count
+    return repository().get_unfixed_count()
+
+# Other questions DuplicateQuestions.py found to be the same question
+def get_duplicates(question_id):
+    return repository().get_duplicates(question_id)
+
+# Full-text search over the OCR text, cleaned questions and answers
+def search_questions(text):
+    return repository().search(text, limit=100)
 
 # GUI Application
 class QuestionEditor(tk.Tk):
@@ -56,9 +43,25 @@ class QuestionEditor(tk.Tk):
         self.geometry("800x600")
         
         self.questions = get_questions()
+        self.image_folder = Config.image_folder(parent=self)
         self.current_index = 0
+        self.search_text = None
+        self.search_results = []
+        self.search_position = -1
+        # Neighbouring screenshots are decoded on a worker thread while the user edits
+        self.prefetcher = ImagePrefetcher.ImagePrefetcher(self.load_image)
+        # Navigating never waits for the database; save results are picked up by poll_saves
+        self.save_queue = SaveQueue.SaveQueue(repository())
         
         # UI Elements
+        self.search_frame = tk.Frame(self)
+        self.search_frame.pack()
+        self.search_entry = tk.Entry(self.search_frame, width=50)
+        self.search_entry.pack(side=tk.LEFT)
+        self.search_entry.bind("<Return>", self.search)
+        self.search_button = tk.Button(self.search_frame, text="Search", command=self.search)
+        self.search_button.pack(side=tk.LEFT)
+        
         self.raw_text_label = tk.Label(self, text="Raw Question:")
         self.raw_text_label.pack()
         self.raw_text_display = tk.Label(self, text="", wraplength=600, justify="left")
@@ -106,8 +109,19 @@ class QuestionEditor(tk.Tk):
         self.unfixed_count_label = tk.Label(self, text=f"Questions to be fixed: {get_unfixed_count()}")
         self.unfixed_count_label.pack()
         
+        self.duplicates_label = tk.Label(self, text="", fg="orange")
+        self.duplicates_label.pack()
+        
+        self.after(SAVE_POLL_MS, self.poll_saves)
         self.load_question()
     
+    def image_path(self, index):
+        return os.path.join(self.image_folder, self.questions[index][1])
+    
+    def load_image(self, img_path):
+        import DisplayImages
+        return DisplayImages.get_display_image(img_path, DisplayImages.EDITOR_SIZE)
+    
     def load_question(self):
         if not self.questions:
             messagebox.showerror("Error", "No questions found!")
@@ -116,37 +130,37 @@ class QuestionEditor(tk.Tk):
         
         q = self.questions[self.current_index]
         q_id, img_filename, raw_text = q
-        img_path = os.path.join(image_folder, img_filename)
+        img_path = os.path.join(self.image_folder, img_filename)
         
         try:
-            img = Image.open(img_path)
-            img = img.resize((600, 400), Image.LANCZOS)
+            from PIL import ImageTk
+            img = self.prefetcher.get(img_path)
             img = ImageTk.PhotoImage(img)
             self.img_label.config(image=img)
             self.img_label.image = img
         except Exception as e:
             messagebox.showerror("Image Error", f"Could not load image: {img_path}\n{e}")
+        indexes = ImagePrefetcher.neighbours(range(len(self.questions)), self.current_index)
+        self.prefetcher.prefetch([self.image_path(index) for index in indexes])
         
         self.raw_text_display.config(text=raw_text)
+        duplicates = get_duplicates(q_id)
+        self.duplicates_label.config(
+            text=f"Same question as: {', '.join(map(str, duplicates))}" if duplicates else "")
         self.cleaned_text_entry.delete(0, tk.END)
         self.cleaned_text_entry.insert(0, raw_text or "")
         
-        conn = sqlite3.connect(db_name)
-        try:
-            cursor = conn.cursor()
-            cursor.execute("SELECT cleaned_question, answer1, answer2, answer3, answer4, correct FROM CleanedData WHERE question_id = ?", (q_id,))
-            answers = cursor.fetchone()
-        finally:
-            conn.close()
+        # An edit still waiting in the save queue is newer than what the database has
+        cleaned_data = self.save_queue.pending_edit(q_id) or repository().get_cleaned_data(q_id)
         
-        if answers:
+        if cleaned_data:
+            cleaned_question, answers = cleaned_data
             self.cleaned_text_entry.delete(0, tk.END)
-            self.cleaned_text_entry.insert(0, answers[0])
-            correct_answers = answers[5].split('|') if answers[5] else []
-            for i in range(4):
+            self.cleaned_text_entry.insert(0, cleaned_question or "")
+            for i, (answer_text, is_correct) in enumerate(answers[:4]):
                 self.answer_entries[i].delete(0, tk.END)
-                self.answer_entries[i].insert(0, answers[i+1])
-                self.answer_vars[i].set(answers[i+1] in correct_answers)
+                self.answer_entries[i].insert(0, answer_text)
+                self.answer_vars[i].set(is_correct)
         else:
             for i in range(4):
                 self.answer_entries[i].delete(0, tk.END)
@@ -160,12 +174,35 @@ class QuestionEditor(tk.Tk):
         q_id = self.questions[self.current_index][0]
         cleaned_text = self.cleaned_text_entry.get()
         answers = [(self.answer_entries[i].get(), self.answer_vars[i].get()) for i in range(4)]
-        try:
-            update_question(q_id, cleaned_text, answers)
+        self.save_queue.save(q_id, cleaned_text, answers)
+    
+    def poll_saves(self):
+        """Show the outcome of saves the background writer finished, then check again shortly."""
+        self.show_save_results(self.save_queue.results())
+        self.after(SAVE_POLL_MS, self.poll_saves)
+    
+    def show_save_results(self, results):
+        # A failure stays on the status line even if other saves finished after it
+        failures = []
+        for question_ids, error, unfixed_count in results:
+            if error is not None:
+                failures.append(f"{', '.join(map(str, question_ids))}: {error}")
+            else:
+                self.unfixed_count_label.config(text=f"Questions to be fixed: {unfixed_count}")
+        if failures:
+            self.status_label.config(text=f"Failed to update question {'; '.join(failures)}", fg="red")
+        elif results:
             self.status_label.config(text="Question updated successfully!", fg="green")
-            self.unfixed_count_label.config(text=f"Questions to be fixed: {get_unfixed_count()}")
-        except Exception as e:
-            self.status_label.config(text=f"Failed to update question: {e}", fg="red")
+    
+    def destroy(self):
+        # Write out queued saves before the window goes away
+        self.save_queue.close()
+        failures = [result for result in self.save_queue.results() if result[1] is not None]
+        for question_ids, error, _ in failures:
+            messagebox.showerror("Save Error",
+                                 f"Failed to update question {', '.join(map(str, question_ids))}: {error}")
+        self.prefetcher.close()
+        super().destroy()
     
     def next_question(self):
         self.status_label.config(text="")
@@ -176,6 +213,29 @@ class QuestionEditor(tk.Tk):
         else:
             messagebox.showinfo("End", "No more questions!")
     
+    def search(self, event=None):
+        """Jump to the best match for the search box; searching again goes to the next match."""
+        text = self.search_entry.get().strip()
+        if not text:
+            return
+        if text != self.search_text:
+            self.search_text = text
+            # Search the database with every queued edit in it
+            self.save_queue.flush()
+            positions = {question[0]: index for index, question in enumerate(self.questions)}
+            self.search_results = [positions[row[0]] for row in search_questions(text) if row[0] in positions]
+            self.search_position = -1
+        if not self.search_results:
+            self.status_label.config(text=f"No questions match '{text}'", fg="red")
+            return
+        
+        self.save_question()
+        self.search_position = (self.search_position + 1) % len(self.search_results)
+        self.current_index = self.search_results[self.search_position]
+        self.load_question()
+        self.status_label.config(
+            text=f"Match {self.search_position + 1} of {len(self.search_results)} for '{text}'", fg="green")
+    
     def prev_question(self):
         self.status_label.config(text="")
         self.save_question()
@@ -184,5 +244,6 @@ class QuestionEditor(tk.Tk):
             self.load_question()
 
 if __name__ == "__main__":
+    Config.parse_args("Edit the OCR'd questions and mark their correct answers.")
     app = QuestionEditor()
     app.mainloop()
@@ -0,0 +1,245 @@
+import atexit
+import re
+import sqlite3
+import threading
+import time
+
+import Migrations
+
+def search_query(text):
+    """Turn what the user typed into an FTS5 query that matches every word as a prefix.
+
+    Words are quoted, so punctuation and FTS5 operators in the input are searched for
+    literally instead of being parsed as query syntax.
+    """
+    words = re.findall(r"\w+", text)
+    return " ".join(f'"{word}"*' for word in words)
+
+class Repository:
+    """Data access over one long-lived connection per thread.
+
+    Connections use WAL journaling, so readers never wait on the writer, and sqlite3's
+    per-connection statement cache, so each query is only prepared once. The first
+    connection brings the database up to date with the class's migrations.
+    """
+    migrations = Migrations.MIGRATIONS
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        self._migrated = False
+
+    @property
+    def conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Each thread only uses its own connection, but close() may run on any thread
+            conn = sqlite3.connect(self.db_path, cached_statements=256, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # With WAL, NORMAL only syncs at checkpoints and is still safe against corruption
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+                if not self._migrated:
+                    Migrations.migrate(conn, self.migrations)
+                    self._migrated = True
+        return conn
+
+    def close(self):
+        """Close every connection this repository opened."""
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+class QuestionRepository(Repository):
+    """Data access for the question bank."""
+
+    # Queries used by the question editor
+
+    def get_questions(self):
+        """Return (id, filename, text) of every question that has cleaned data, unfixed first."""
+        return self.conn.execute(
+            "SELECT ImageText.id, ImageText.filename, text FROM ImageText "
+            "JOIN CleanedData on CleanedData.question_id = ImageText.id "
+            "ORDER BY fixed ASC, ImageText.id ASC").fetchall()
+
+    def get_cleaned_data(self, question_id):
+        """Return (cleaned_question, [(answer_text, is_correct), ...]) or None."""
+        row = self.conn.execute("SELECT cleaned_question FROM CleanedData WHERE question_id = ?",
+                                (question_id,)).fetchone()
+        return (row[0], self.get_answers(question_id)) if row else None
+
+    def save_cleaned_question(self, question_id, cleaned_text, answers):
+        """Insert or update a question's cleaned text and (answer_text, is_correct) pairs and mark it fixed."""
+        correct_answers = '|'.join([answer_text for answer_text, is_correct in answers if is_correct])
+        answer1, answer2, answer3, answer4 = [answer_text for answer_text, _ in answers]
+        self.conn.execute("""
+            INSERT INTO CleanedData (question_id, cleaned_question, answer1, answer2, answer3, answer4, correct,
+                                     fixed, fixed_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, 1, ?)
+            ON CONFLICT(question_id) DO UPDATE SET
+                cleaned_question = excluded.cleaned_question,
+                answer1 = excluded.answer1, answer2 = excluded.answer2,
+                answer3 = excluded.answer3, answer4 = excluded.answer4,
+                correct = excluded.correct, fixed = 1, fixed_at = excluded.fixed_at
+        """, (question_id, cleaned_text, answer1, answer2, answer3, answer4, correct_answers, time.time()))
+        # The CleanedData triggers match correct answers by text; set the flags by position instead
+        self.conn.executemany("UPDATE Answers SET is_correct = ? WHERE question_id = ? AND position = ?",
+                              [(int(bool(is_correct)), question_id, position)
+                               for position, (_, is_correct) in enumerate(answers, 1)])
+
+    def update_question(self, question_id, cleaned_text, answers):
+        """Save the cleaned text and (answer_text, is_correct) pairs and mark the question fixed."""
+        self.update_questions([(question_id, cleaned_text, answers)])
+
+    def update_questions(self, edits):
+        """Save (question_id, cleaned_text, answers) edits in one transaction, as update_question does."""
+        with self.conn:
+            for question_id, cleaned_text, answers in edits:
+                self.conn.execute("UPDATE ImageText SET text = ? WHERE id = ?", (cleaned_text, question_id))
+                self.save_cleaned_question(question_id, cleaned_text, answers)
+            Migrations.refresh_search_index(self.conn)
+
+    def refresh_search_index(self):
+        """Bring QuestionSearch up to date with questions changed since the last refresh (see Migrations.migration_9)."""
+        if self.conn.execute("SELECT 1 FROM SearchPending LIMIT 1").fetchone():
+            with self.conn:
+                Migrations.refresh_search_index(self.conn)
+
+    def search(self, text, limit=20):
+        """Return (id, filename, question text) of the questions best matching text, best first.
+
+        Searches the OCR text, cleaned question and answers through the QuestionSearch
+        FTS5 index. A match in the cleaned question counts double. Matches are ranked
+        inside the index, so only the best limit are joined to the question tables.
+        """
+        query = search_query(text)
+        if not query:
+            return []
+        self.refresh_search_index()
+        return self.conn.execute("""
+            SELECT ImageText.id, ImageText.filename, coalesce(CleanedData.cleaned_question, ImageText.text)
+            FROM (
+                SELECT rowid, bm25(QuestionSearch, 1.0, 2.0, 1.0) AS score
+                FROM QuestionSearch WHERE QuestionSearch MATCH ? ORDER BY score LIMIT ?
+            ) AS matches
+            JOIN ImageText ON ImageText.id = matches.rowid
+            LEFT JOIN CleanedData ON CleanedData.question_id = ImageText.id
+            ORDER BY matches.score
+        """, (query, limit)).fetchall()
+
+    def get_duplicates(self, question_id):
+        """Return the ids of the other questions in the question's duplicate cluster."""
+        return [row[0] for row in self.conn.execute(
+            "SELECT other.question_id FROM QuestionDuplicates AS this "
+            "JOIN QuestionDuplicates AS other ON other.cluster_id = this.cluster_id "
+            "WHERE this.question_id = ? AND other.question_id <> this.question_id ORDER BY other.question_id",
+            (question_id,))]
+
+    def get_unfixed_count(self):
+        """Return how many questions still need to be fixed."""
+        return self.get_progress().get("unfixed", 0)
+
+    def get_progress(self):
+        """Return {status: count} of CleanedData rows, with status 'fixed', 'unfixed' or another fixed value.
+
+        Reads the trigger-maintained CleanedDataStats table, so the cost does not grow with the bank.
+        """
+        return dict(self.conn.execute("SELECT status, count FROM CleanedDataStats"))
+
+    def rebuild_progress(self):
+        """Recount CleanedDataStats from CleanedData.
+
+        Only needed if rows were changed with its triggers bypassed, e.g. INSERT OR REPLACE,
+        which deletes rows without firing delete triggers.
+        """
+        with self.conn:
+            self.conn.execute("DELETE FROM CleanedDataStats")
+            Migrations.fill_stats(self.conn)
+
+    # Queries used by the quiz
+
+    def get_fixed_questions(self):
+        """Return (id, filename, text) of every fixed question."""
+        return self.conn.execute(
+            "SELECT ImageText.id, ImageText.filename, ImageText.text FROM ImageText "
+            "JOIN CleanedData ON CleanedData.question_id = ImageText.id "
+            "WHERE CleanedData.fixed = 1").fetchall()
+
+    def get_quiz_rows(self):
+        """Return (id, filename, text, position, answer_text, is_correct) of every answer of every fixed question.
+
+        Questions whose duplicate-cluster representative (see DuplicateQuestions.py)
+        is itself in the quiz are left out. Rows are ordered by question id and answer position.
+        """
+        return self.conn.execute(
+            "SELECT ImageText.id, ImageText.filename, ImageText.text, "
+            "Answers.position, Answers.text, Answers.is_correct FROM CleanedData "
+            "JOIN ImageText ON ImageText.id = CleanedData.question_id "
+            "JOIN Answers ON Answers.question_id = CleanedData.question_id "
+            "WHERE CleanedData.fixed = 1 AND NOT EXISTS ("
+            "    SELECT 1 FROM QuestionDuplicates "
+            "    JOIN CleanedData AS representative ON representative.question_id = QuestionDuplicates.cluster_id "
+            "    WHERE QuestionDuplicates.question_id = CleanedData.question_id "
+            "    AND QuestionDuplicates.cluster_id <> CleanedData.question_id AND representative.fixed = 1) "
+            "ORDER BY ImageText.id, Answers.position").fetchall()
+
+    def get_answers(self, question_id):
+        """Return the (answer_text, is_correct) pairs of a question in position order."""
+        return [(text or "", bool(is_correct)) for text, is_correct in self.conn.execute(
+            "SELECT text, is_correct FROM Answers WHERE question_id = ? ORDER BY position", (question_id,))]
+
+    def get_correct_answers(self, question_id):
+        """Return the list of correct answer texts of a question."""
+        return [row[0] for row in self.conn.execute(
+            "SELECT text FROM Answers WHERE question_id = ? AND is_correct = 1 ORDER BY position", (question_id,))]
+
+class ProgressRepository(Repository):
+    """Per-learner spaced-repetition state, kept in its own database file (see Migrations.PROGRESS_MIGRATIONS)."""
+    migrations = Migrations.PROGRESS_MIGRATIONS
+
+    def get_learner_progress(self, learner):
+        """Return (question_id, box, due) of every question the learner has answered."""
+        return self.conn.execute("SELECT question_id, box, due FROM LearnerProgress WHERE learner = ?",
+                                 (learner,)).fetchall()
+
+    def save_progress(self, learner, question_id, box, due, correct):
+        """Record the learner's new box and due time for a question after a right or wrong answer."""
+        with self.conn:
+            self.conn.execute("""
+                INSERT INTO LearnerProgress (learner, question_id, box, due, correct_count, wrong_count)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(learner, question_id) DO UPDATE SET
+                    box = excluded.box, due = excluded.due,
+                    correct_count = correct_count + excluded.correct_count,
+                    wrong_count = wrong_count + excluded.wrong_count
+            """, (learner, question_id, box, due, int(bool(correct)), int(not correct)))
+
+# One repository per database file for the whole process
+_repositories = {}
+_repositories_lock = threading.Lock()
+
+def get_repository(db_path, repository_class=QuestionRepository):
+    """Return the shared repository for a database file."""
+    with _repositories_lock:
+        repository = _repositories.get((repository_class, db_path))
+        if repository is None:
+            repository = _repositories[repository_class, db_path] = repository_class(db_path)
+        return repository
+
+def get_progress_repository(db_path):
+    """Return the shared learner-progress repository for a database file."""
+    return get_repository(db_path, ProgressRepository)
+
+@atexit.register
+def close_all():
+    """Close every repository's connections."""
+    with _repositories_lock:
+        for repository in _repositories.values():
+            repository.close()
+        _repositories.clear()
@@ -0,0 +1,78 @@
+import hashlib
+import os
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+# Where the display-sized copies of the screenshots are kept
+DERIVATIVE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "display_cache")
+
+# Sizes the GUIs show images at
+QUIZ_SIZE = (600, 400)
+EDITOR_SIZE = (600, 400)
+IMPORT_EDITOR_SIZE = (500, 350)
+
+def derivative_path(image_path, size):
+    """Return where the display copy of image_path at size is stored."""
+    stem = os.path.splitext(os.path.basename(image_path))[0]
+    # Folders may hold files with the same name, so include a hash of the full path
+    path_hash = hashlib.sha1(os.path.abspath(image_path).encode("utf-8")).hexdigest()[:8]
+    return os.path.join(DERIVATIVE_DIR, f"{size[0]}x{size[1]}", f"{stem}_{path_hash}.jpg")
+
+def render_derivative(image_path, size):
+    """Resize the source image to size and save it as a display copy. Returns the resized image."""
+    img = Image.open(image_path)
+    # For JPEGs, decode at a reduced scale that is still at least twice the target size
+    img.draft("RGB", (size[0] * 2, size[1] * 2))
+    img = img.convert("RGB").resize(size, Image.LANCZOS)
+
+    path = derivative_path(image_path, size)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # A unique temp file, since prefetch threads may render the same image at the same time
+    fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, "wb") as tmp_file:
+            img.save(tmp_file, "JPEG", quality=90)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return img
+
+def is_fresh(image_path, path):
+    """Return True if the display copy at path exists and is newer than its source."""
+    try:
+        return os.path.getmtime(path) >= os.path.getmtime(image_path)
+    except OSError:
+        return False
+
+def get_display_image(image_path, size):
+    """Return the display-sized image for image_path, rendering it first if it is missing or stale."""
+    path = derivative_path(image_path, size)
+    if is_fresh(image_path, path):
+        img = Image.open(path)
+        img.load()
+        return img
+    return render_derivative(image_path, size)
+
+def build_derivatives(image_folder, sizes=(QUIZ_SIZE, IMPORT_EDITOR_SIZE), workers=None):
+    """Render every missing or stale display copy for the images in a folder. Returns how many were made."""
+    jobs = []
+    for filename in sorted(os.listdir(image_folder)):
+        if filename.lower().endswith((".png", ".jpg", ".jpeg")):
+            image_path = os.path.join(image_folder, filename)
+            for size in set(sizes):
+                if not is_fresh(image_path, derivative_path(image_path, size)):
+                    jobs.append((image_path, size))
+
+    # PIL releases the GIL while decoding and resizing, so threads are enough here
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(lambda job: render_derivative(*job), jobs))
+    return len(jobs)
+
+if __name__ == "__main__":
+    folder = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(os.path.abspath(__file__)), "Source_img")
+    count = build_derivatives(folder)
+    print(f"Rendered {count} display images into {DERIVATIVE_DIR}")
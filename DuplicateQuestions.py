@@ -0,0 +1,149 @@
+import argparse
+import re
+import sqlite3
+import time
+
+import numpy as np
+
+import Migrations
+
+# Questions are compared on character shingles of their normalized text and answers.
+# Character shingles tolerate OCR letter swaps far better than word shingles do.
+SHINGLE_SIZE = 4
+# MinHash signatures are split into BANDS bands of NUM_PERM // BANDS rows. Two questions
+# become candidates if any band matches, which happens with probability
+# 1 - (1 - J^6)^20: 99.8% at Jaccard similarity 0.8, 27% at 0.5.
+NUM_PERM = 120
+BANDS = 20
+# Candidates whose estimated Jaccard similarity is at least this, and whose questions
+# contain the same numbers, are duplicates. On the current bank, different questions
+# built from one template ("Alberta joined confederation in year"/"Saskatchewan ...")
+# reach 0.72, while copies with 2% of their characters garbled are 0.87 on median.
+# Years matter ("refugees in 1956"/"in 1975"), hence the number check.
+DEFAULT_THRESHOLD = 0.8
+
+_rng = np.random.default_rng(20250302)
+# Multiply-shift hash family: h(x) = ((a * x + b) mod 2^64) >> 32, with a odd
+_HASH_A = _rng.integers(1, 2**63, size=NUM_PERM, dtype=np.uint64) | np.uint64(1)
+_HASH_B = _rng.integers(0, 2**63, size=NUM_PERM, dtype=np.uint64)
+
+def normalize(text):
+    """Lowercase, drop punctuation and the one-letter tokens OCR leaves from the A-D answer boxes."""
+    words = re.sub(r"[^\w]+", " ", text.lower()).split()
+    return " ".join(word for word in words if len(word) > 1)
+
+def shingles(text, size=SHINGLE_SIZE):
+    """Return the distinct character shingles of text as 32-bit integers."""
+    data = np.frombuffer(text.encode("utf-8"), dtype=np.uint8).astype(np.uint32)
+    if len(data) < size:
+        return np.unique(data) if len(data) else data
+    # Roll each window of bytes into one 32-bit value with a polynomial hash
+    values = np.zeros(len(data) - size + 1, dtype=np.uint32)
+    for offset in range(size):
+        values = values * np.uint32(257) + data[offset:len(data) - size + 1 + offset]
+    return np.unique(values)
+
+def minhash(values):
+    """Return the NUM_PERM-value MinHash signature of a set of shingles."""
+    if not len(values):
+        return np.full(NUM_PERM, np.iinfo(np.uint32).max, dtype=np.uint32)
+    with np.errstate(over="ignore"):
+        hashed = (_HASH_A[:, None] * values.astype(np.uint64)[None, :] + _HASH_B[:, None]) >> np.uint64(32)
+    return hashed.min(axis=1).astype(np.uint32)
+
+def question_text(row):
+    """The text a (question_id, cleaned_question, answer1-4, fixed) row is compared on."""
+    return normalize(" ".join(part or "" for part in row[1:6]))
+
+def question_numbers(row):
+    """The numbers in the question text, which must match for two questions to be duplicates."""
+    return re.findall(r"\d+", row[1] or "")
+
+def candidate_pairs(signatures, bands=BANDS):
+    """Yield (i, j) index pairs whose signatures share at least one LSH band.
+
+    Within a bucket every member is paired with the bucket's first member only, which
+    keeps a question repeated hundreds of times linear instead of quadratic.
+    """
+    rows = signatures.shape[1] // bands
+    seen = set()
+    for band in range(bands):
+        buckets = {}
+        for index, key in enumerate(map(bytes, signatures[:, band * rows:(band + 1) * rows])):
+            first = buckets.setdefault(key, index)
+            if first != index and (first, index) not in seen:
+                seen.add((first, index))
+                yield first, index
+
+def find_clusters(rows, threshold=DEFAULT_THRESHOLD):
+    """Group (question_id, cleaned_question, answer1-4, fixed) rows into duplicate clusters.
+
+    Returns {question_id: (representative_id, similarity to the representative)} for
+    every question in a cluster of two or more. The representative is the lowest id
+    among the cluster's fixed questions, or the lowest id if none is fixed.
+    """
+    if not rows:
+        return {}
+    signatures = np.stack([minhash(shingles(question_text(row))) for row in rows])
+
+    # Union-find over row indexes
+    parent = list(range(len(rows)))
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    numbers = [question_numbers(row) for row in rows]
+    for i, j in candidate_pairs(signatures):
+        if (numbers[i] == numbers[j]
+                and np.count_nonzero(signatures[i] == signatures[j]) / NUM_PERM >= threshold):
+            parent[find(i)] = find(j)
+
+    members = {}
+    for index in range(len(rows)):
+        members.setdefault(find(index), []).append(index)
+
+    clusters = {}
+    for group in members.values():
+        if len(group) < 2:
+            continue
+        representative = min(group, key=lambda index: (rows[index][6] != 1, rows[index][0]))
+        for index in group:
+            similarity = float(np.count_nonzero(signatures[index] == signatures[representative]) / NUM_PERM)
+            clusters[rows[index][0]] = (rows[representative][0], similarity)
+    return clusters
+
+def update_duplicate_table(conn, threshold=DEFAULT_THRESHOLD):
+    """Recompute the QuestionDuplicates table from CleanedData. Returns the clusters (see find_clusters)."""
+    Migrations.migrate(conn)
+    rows = conn.execute(
+        "SELECT question_id, cleaned_question, answer1, answer2, answer3, answer4, fixed "
+        "FROM CleanedData WHERE question_id IS NOT NULL ORDER BY question_id").fetchall()
+    clusters = find_clusters(rows, threshold)
+    with conn:
+        conn.execute("DELETE FROM QuestionDuplicates")
+        conn.executemany("INSERT INTO QuestionDuplicates (question_id, cluster_id, similarity) VALUES (?, ?, ?)",
+                         [(question_id, cluster_id, similarity)
+                          for question_id, (cluster_id, similarity) in clusters.items()])
+    return clusters
+
+def main():
+    parser = argparse.ArgumentParser(description="Find questions that appear more than once in CleanedData.")
+    parser.add_argument("db_path", nargs="?", default="Question_DB.db", help="SQLite database to scan")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="minimum estimated Jaccard similarity of duplicates")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    conn = sqlite3.connect(args.db_path)
+    try:
+        clusters = update_duplicate_table(conn, args.threshold)
+    finally:
+        conn.close()
+    cluster_count = len(set(cluster_id for cluster_id, _ in clusters.values()))
+    print(f"{len(clusters)} questions in {cluster_count} duplicate clusters "
+          f"({time.perf_counter() - start:.2f}s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# How many questions before and after the current one to decode in the background
+PREFETCH_AHEAD = 2
+# Decoded images kept in memory; a 600x400 RGB image takes about 0.7 MB
+MAX_CACHE_BYTES = 64 * 1024 * 1024
+
+def image_bytes(img):
+    return img.width * img.height * len(img.getbands())
+
+class ImagePrefetcher:
+    """Decode images on a worker thread into a memory-bounded LRU cache.
+
+    loader(key) returns a PIL image. The GUI calls prefetch() with the keys it will
+    probably show next and get() for the one it shows now; get() only blocks if that
+    image is not decoded yet.
+    """
+
+    def __init__(self, loader, max_bytes=MAX_CACHE_BYTES, workers=1):
+        self.loader = loader
+        self.max_bytes = max_bytes
+        self._cache = OrderedDict()
+        self._cache_bytes = 0
+        self._pending = {}
+        self._wanted = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ImagePrefetcher")
+
+    def _store(self, key, img):
+        with self._lock:
+            if key in self._cache:
+                return
+            self._cache[key] = img
+            self._cache_bytes += image_bytes(img)
+            while self._cache_bytes > self.max_bytes and len(self._cache) > 1:
+                _, evicted = self._cache.popitem(last=False)
+                self._cache_bytes -= image_bytes(evicted)
+
+    def _load(self, key):
+        with self._lock:
+            # The user moved on before this job started; skip it
+            if key not in self._wanted:
+                self._pending.pop(key, None)
+                return None
+        try:
+            img = self.loader(key)
+            img.load()
+            self._store(key, img)
+            return img
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+
+    def prefetch(self, keys):
+        """Start decoding keys that are neither cached nor already queued; drop queued keys not in keys."""
+        with self._lock:
+            self._wanted = set(keys)
+            for key in keys:
+                if key in self._cache or key in self._pending:
+                    continue
+                self._pending[key] = self._executor.submit(self._load, key)
+
+    def get(self, key):
+        """Return the image for key, waiting for a queued decode or loading it on this thread."""
+        with self._lock:
+            img = self._cache.get(key)
+            if img is not None:
+                self._cache.move_to_end(key)
+                return img
+            self._wanted.add(key)
+            future = self._pending.get(key)
+        if future is not None:
+            try:
+                img = future.result()
+            except Exception:
+                img = None
+            if img is not None:
+                return img
+        # Not prefetched, or prefetching failed: load here so errors reach the caller
+        img = self.loader(key)
+        img.load()
+        self._store(key, img)
+        return img
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+def neighbours(sequence, index, ahead=PREFETCH_AHEAD):
+    """Return the items up to ahead positions after, then before, index: what navigation shows next."""
+    after = sequence[index + 1:index + 1 + ahead]
+    before = sequence[max(0, index - ahead):index][::-1]
+    return list(after) + list(before)
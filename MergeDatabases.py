@@ -0,0 +1,241 @@
+import argparse
+import json
+import os
+import sqlite3
+import time
+
+import Migrations
+
+# Columns a merged question is built from; sources missing some of them read them as NULL
+IMAGE_COLUMNS = ("text",)
+CLEANED_COLUMNS = ("question_number", "cleaned_question", "answer1", "answer2", "answer3", "answer4",
+                   "correct", "fixed")
+
+class SourceRow:
+    """One question of one source database."""
+    __slots__ = ("source", "filename", "id", "values", "flags", "fixed_at", "digest", "fixed", "has_cleaned_data")
+
+    def __init__(self, source, filename, id, values, flags, fixed_at=None):
+        self.source = source
+        self.filename = filename
+        self.id = id
+        self.values = values
+        self.flags = flags
+        # When the row was last saved in the editor (CleanedData.fixed_at); not part of the digest
+        self.fixed_at = fixed_at
+        # Rows are compared by this hash rather than column by column. Python's tuple hash
+        # is only stable within one process, which is all a merge needs.
+        self.digest = hash((values, flags))
+        self.fixed = values[-1] == 1
+        self.has_cleaned_data = any(value is not None for value in values[len(IMAGE_COLUMNS):])
+
+def table_columns(conn, table):
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+def read_source(path, rank):
+    """Read every question of a database in one query. Returns {filename: SourceRow}, {filename: content hash}.
+
+    The content hashes are those this source's ImageFiles table recorded, if it has one.
+
+    The database is opened read-only and never migrated. When a filename has several
+    ImageText rows, the one with cleaned data (then the lowest id) is used.
+    """
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        if "ImageText" not in tables:
+            return {}, {}
+        cleaned_columns = table_columns(conn, "CleanedData") if "CleanedData" in tables else set()
+        select = ", ".join([f"ImageText.{column}" for column in IMAGE_COLUMNS] +
+                           [f"CleanedData.{column}" if column in cleaned_columns else "NULL"
+                            for column in CLEANED_COLUMNS])
+        select += ", CleanedData.fixed_at" if "fixed_at" in cleaned_columns else ", NULL"
+        join = "LEFT JOIN CleanedData ON CleanedData.question_id = ImageText.id" if cleaned_columns else ""
+        order = "CleanedData.question_id IS NULL, ImageText.id" if cleaned_columns else "ImageText.id"
+        rows = conn.execute(f"SELECT ImageText.id, ImageText.filename, {select} FROM ImageText {join} ORDER BY {order}")
+
+        flags = {}
+        if "Answers" in tables:
+            for question_id, position_flags in conn.execute(
+                    "SELECT question_id, group_concat(is_correct, '') FROM "
+                    "(SELECT question_id, is_correct FROM Answers ORDER BY question_id, position) "
+                    "GROUP BY question_id"):
+                flags[question_id] = position_flags
+
+        questions = {}
+        for question_id, filename, *values, fixed_at in rows:
+            if filename is not None and filename not in questions:
+                questions[filename] = SourceRow(rank, filename, question_id, tuple(values), flags.get(question_id),
+                                                fixed_at)
+
+        content_hashes = {}
+        if "ImageFiles" in tables:
+            content_hashes = dict(conn.execute("SELECT filename, content_hash FROM ImageFiles"))
+        return questions, content_hashes
+    finally:
+        conn.close()
+
+def choose(rows):
+    """Pick the row the merge keeps for one question and say whether it was a conflict.
+
+    Policy: rows fixed in the editor beat unfixed ones. Among fixed rows the one saved
+    last (CleanedData.fixed_at) wins. Rows fixed before that column existed have no
+    time and lose to rows that have one; between those, and for unfixed rows, the
+    source rank decides, which is only file modification time and so says little
+    about copies that were checked out or copied around. A conflict is two or more
+    fixed rows that differ, since a hand fix is lost. Returns (row, kind) with kind
+    'same', 'merged' or 'conflict'.
+    """
+    if len({row.digest for row in rows}) == 1:
+        return rows[-1], "same"
+    fixed = [row for row in rows if row.fixed]
+    if fixed:
+        winner = max(fixed, key=lambda row: (row.fixed_at is not None, row.fixed_at or 0, row.source))
+        return winner, "conflict" if len({row.digest for row in fixed}) > 1 else "merged"
+    cleaned = [row for row in rows if row.has_cleaned_data]
+    return (cleaned or rows)[-1], "merged"
+
+def describe_differences(winner, rows, columns):
+    """Return, for a report, which columns of each other row differ from the winner."""
+    differences = []
+    for row in rows:
+        if row is winner or row.digest == winner.digest:
+            continue
+        changed = [column for column, ours, theirs in zip(columns, winner.values, row.values) if ours != theirs]
+        if row.flags != winner.flags:
+            changed.append("answer flags")
+        differences.append({"source": row.source, "fixed": row.fixed, "columns": changed})
+    return differences
+
+def merge_databases(sources, output_path, report_path=None):
+    """Merge source databases into a new consolidated database at output_path.
+
+    Questions are matched by image filename. A file whose name no earlier source has
+    is matched by the content hash its source's ImageFiles table recorded, if any,
+    to a question of another source with the same hash, which links renamed files.
+    Several files of one source with the same content stay separate questions.
+    Sources are ranked from oldest to newest by file modification time, with the
+    later-listed source winning ties; see choose() for how that rank is used. Returns
+    the report (also written to report_path as JSON if given).
+    """
+    if os.path.exists(output_path):
+        raise FileExistsError(f"{output_path} already exists")
+    start = time.perf_counter()
+    ranked = sorted(enumerate(sources), key=lambda item: (os.path.getmtime(item[1]), item[0]))
+    ranked_paths = [path for _, path in ranked]
+
+    groups = []
+    by_filename = {}
+    by_content = {}
+    for rank, path in enumerate(ranked_paths):
+        questions, content_hashes = read_source(path, rank)
+        # Match on filename first, so sources with and without ImageFiles key questions alike.
+        # A group takes at most one row per source, so copies of one image in a source stay apart.
+        placed = {}
+        unmatched = []
+        for filename in sorted(questions):
+            group = by_filename.get(filename)
+            if group is None or group[-1].source == rank:
+                unmatched.append(filename)
+            else:
+                group.append(questions[filename])
+                placed[filename] = group
+        for filename in unmatched:
+            # A file renamed since another source was ingested still has that source's content hash
+            content_hash = content_hashes.get(filename)
+            candidates = by_content.get(content_hash, ()) if content_hash is not None else ()
+            group = next((group for group in candidates if group[-1].source != rank), None)
+            if group is None:
+                group = []
+                groups.append(group)
+            group.append(questions[filename])
+            placed[filename] = group
+            by_filename.setdefault(filename, group)
+        for filename, group in placed.items():
+            content_hash = content_hashes.get(filename)
+            if content_hash is not None and not any(other is group for other in by_content.get(content_hash, ())):
+                by_content.setdefault(content_hash, []).append(group)
+
+    columns = IMAGE_COLUMNS + CLEANED_COLUMNS
+    counts = {"same": 0, "merged": 0, "conflict": 0}
+    conflicts = []
+    chosen = []
+    for rows in groups:
+        winner, kind = choose(rows)
+        counts[kind] += 1
+        chosen.append(winner)
+        if kind == "conflict":
+            conflicts.append({"filename": winner.filename, "kept": ranked_paths[winner.source],
+                              "differences": [dict(difference, source=ranked_paths[difference["source"]])
+                                              for difference in describe_differences(winner, rows, columns)]})
+
+    # Keep ids from the newest source that has the question, renumbering on collisions
+    chosen.sort(key=lambda row: (-row.source, row.id))
+    used_ids = set()
+    next_id = max((row.id for row in chosen), default=0) + 1
+    image_rows, cleaned_rows, flag_rows = [], [], []
+    for row in chosen:
+        question_id = row.id
+        if question_id in used_ids:
+            question_id, next_id = next_id, next_id + 1
+        used_ids.add(question_id)
+        image_rows.append((question_id, row.filename, *row.values[:len(IMAGE_COLUMNS)]))
+        if row.has_cleaned_data:
+            cleaned_rows.append((question_id, *row.values[len(IMAGE_COLUMNS):], row.fixed_at))
+            if row.flags:
+                flag_rows.extend((int(flag), question_id, position)
+                                 for position, flag in enumerate(row.flags, 1))
+
+    conn = sqlite3.connect(output_path)
+    try:
+        Migrations.migrate(conn)
+        conn.execute("BEGIN")
+        # Bulk load without per-row triggers, then rebuild what they would have maintained
+        with Migrations.triggers_dropped(conn):
+            conn.executemany(f"INSERT INTO ImageText (id, filename, {', '.join(IMAGE_COLUMNS)}) "
+                             f"VALUES ({', '.join('?' * (2 + len(IMAGE_COLUMNS)))})", image_rows)
+            conn.executemany(f"INSERT INTO CleanedData (question_id, {', '.join(CLEANED_COLUMNS)}, fixed_at) "
+                             f"VALUES ({', '.join('?' * (2 + len(CLEANED_COLUMNS)))})", cleaned_rows)
+            Migrations.rebuild_derived_tables(conn)
+            conn.executemany("UPDATE Answers SET is_correct = ? WHERE question_id = ? AND position = ?", flag_rows)
+        conn.commit()
+    except Exception:
+        conn.close()
+        os.remove(output_path)
+        raise
+    conn.close()
+
+    report = {
+        "sources": ranked_paths,
+        "output": output_path,
+        "questions": len(chosen),
+        "identical": counts["same"],
+        "merged": counts["merged"],
+        "conflicts": conflicts,
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+    if report_path:
+        with open(report_path, "w") as f:
+            json.dump(report, f, indent=2)
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Merge diverged copies of the question database into one. "
+                    "Hand-fixed rows win over unfixed ones, then the most recently fixed row, "
+                    "then the most recently modified database.")
+    parser.add_argument("sources", nargs="+", help="databases to merge")
+    parser.add_argument("-o", "--output", required=True, help="new database to write")
+    parser.add_argument("--report", help="write the merge report to this JSON file")
+    args = parser.parse_args()
+
+    report = merge_databases(args.sources, args.output, args.report)
+    print(f"{report['questions']} questions: {report['identical']} identical, {report['merged']} merged, "
+          f"{len(report['conflicts'])} conflicts ({report['seconds']}s)")
+    for conflict in report["conflicts"]:
+        print(f"  {conflict['filename']}: kept {conflict['kept']}")
+        for difference in conflict["differences"]:
+            print(f"    {difference['source']} differs in {', '.join(difference['columns'])}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,366 @@
+import sqlite3
+import sys
+from contextlib import contextmanager
+
+# Schema migrations, applied in order. The database's PRAGMA user_version records the
+# last one applied, so every migration runs exactly once per database.
+
+def answer_columns(row, position):
+    """SQL for the (question_id, position, text, is_correct) of answer number position of a CleanedData row."""
+    answer = f"{row}.answer{position}"
+    return (f"{row}.question_id, {position}, {answer}, "
+            f"coalesce({answer} <> '' AND instr('|' || {row}.correct || '|', '|' || {answer} || '|') > 0, 0)")
+
+def migration_1_base_tables(conn):
+    """Create ImageText and CleanedData if missing and give CleanedData the correct/fixed columns.
+
+    CleanedData tables made by data_Import/Editor.py store correct answers in a
+    comma-joined correct_answers column; those are converted to the '|'-joined
+    correct column the other tools use.
+    """
+    conn.execute("CREATE TABLE IF NOT EXISTS ImageText (id INTEGER PRIMARY KEY, filename TEXT, text TEXT)")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS CleanedData (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            question_id INTEGER UNIQUE,
+            question_number TEXT,
+            cleaned_question TEXT,
+            answer1 TEXT,
+            answer2 TEXT,
+            answer3 TEXT,
+            answer4 TEXT,
+            correct TEXT,
+            fixed INTEGER
+        )
+    """)
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(CleanedData)")]
+    for column, column_type in (("question_number", "TEXT"), ("correct", "TEXT"), ("fixed", "INTEGER")):
+        if column not in columns:
+            conn.execute(f"ALTER TABLE CleanedData ADD COLUMN {column} {column_type}")
+
+    if "correct_answers" in columns:
+        rows = conn.execute("""
+            SELECT id, answer1, answer2, answer3, answer4, correct_answers FROM CleanedData
+            WHERE correct IS NULL AND correct_answers IS NOT NULL
+        """).fetchall()
+        updates = []
+        for row_id, *answers, correct_answers in rows:
+            correct_list = correct_answers.split(',')
+            updates.append(('|'.join(a for a in answers if a and a in correct_list), row_id))
+        conn.executemany("UPDATE CleanedData SET correct = ? WHERE id = ?", updates)
+
+def fill_answers(conn):
+    """Fill an empty Answers table from CleanedData's answer1-4/correct columns."""
+    conn.execute(f"""
+        INSERT INTO Answers (question_id, position, text, is_correct)
+        {' UNION ALL '.join(f"SELECT {answer_columns('c', p)} FROM CleanedData c WHERE c.question_id IS NOT NULL"
+                            for p in range(1, 5))}
+    """)
+
+def migration_2_answers_table(conn):
+    """Move answers into an Answers child table with a position and an is_correct flag.
+
+    The answer1-4/correct columns stay for older scripts; triggers copy any write to
+    them into Answers. Code that knows about Answers sets is_correct by position
+    afterwards, which also works when two answers have the same text.
+    """
+    conn.execute("""
+        CREATE TABLE Answers (
+            id INTEGER PRIMARY KEY,
+            question_id INTEGER NOT NULL,
+            position INTEGER NOT NULL,
+            text TEXT,
+            is_correct INTEGER NOT NULL DEFAULT 0,
+            UNIQUE (question_id, position)
+        )
+    """)
+    fill_answers(conn)
+    values = lambda row: ", ".join(f"({answer_columns(row, p)})" for p in range(1, 5))
+    conn.execute(f"""
+        CREATE TRIGGER CleanedData_answers_insert AFTER INSERT ON CleanedData
+        WHEN NEW.question_id IS NOT NULL
+        BEGIN
+            INSERT OR REPLACE INTO Answers (question_id, position, text, is_correct) VALUES {values('NEW')};
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER CleanedData_answers_update
+        AFTER UPDATE OF question_id, answer1, answer2, answer3, answer4, correct ON CleanedData
+        BEGIN
+            DELETE FROM Answers WHERE question_id = OLD.question_id;
+            INSERT OR REPLACE INTO Answers (question_id, position, text, is_correct) VALUES {values('NEW')};
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER CleanedData_answers_delete AFTER DELETE ON CleanedData
+        BEGIN
+            DELETE FROM Answers WHERE question_id = OLD.question_id;
+        END
+    """)
+
+def migration_3_indexes(conn):
+    """Index the columns the editor, quiz and import scripts filter and sort on."""
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_CleanedData_fixed ON CleanedData (fixed)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_ImageText_filename ON ImageText (filename)")
+    # Answers(question_id, position) is already indexed by its UNIQUE constraint
+    conn.execute("ANALYZE")
+
+def migration_4_source_hash(conn):
+    """Record which ImageText text each CleanedData row was parsed from, so unchanged rows can be skipped."""
+    conn.execute("ALTER TABLE CleanedData ADD COLUMN source_hash TEXT")
+
+# Rebuilds one question's QuestionSearch row from its current ImageText, CleanedData and Answers
+SEARCH_ROW_SQL = """
+    DELETE FROM QuestionSearch WHERE rowid = {id};
+    INSERT INTO QuestionSearch (rowid, text, cleaned_question, answers)
+        SELECT ImageText.id, ImageText.text, CleanedData.cleaned_question,
+               (SELECT group_concat(text, ' ') FROM Answers WHERE Answers.question_id = ImageText.id)
+        FROM ImageText LEFT JOIN CleanedData ON CleanedData.question_id = ImageText.id
+        WHERE ImageText.id = {id};
+"""
+
+def fill_search_index(conn):
+    """Fill an empty QuestionSearch index from ImageText, CleanedData and Answers."""
+    conn.execute("""
+        INSERT INTO QuestionSearch (rowid, text, cleaned_question, answers)
+        SELECT ImageText.id, ImageText.text, CleanedData.cleaned_question,
+               (SELECT group_concat(text, ' ') FROM Answers WHERE Answers.question_id = ImageText.id)
+        FROM ImageText LEFT JOIN CleanedData ON CleanedData.question_id = ImageText.id
+    """)
+
+def migration_5_search_index(conn):
+    """Add the QuestionSearch FTS5 index over OCR text, cleaned questions and answers.
+
+    Its rowid is the ImageText id. Triggers on the three source tables rebuild a
+    question's row whenever any of its searchable text changes.
+    """
+    conn.execute("""
+        CREATE VIRTUAL TABLE QuestionSearch USING fts5(
+            text, cleaned_question, answers,
+            tokenize = 'unicode61 remove_diacritics 2',
+            -- Search words are prefix-matched; these keep short prefixes fast on large tables
+            prefix = '2 3 4 5 6'
+        )
+    """)
+    fill_search_index(conn)
+    triggers = [
+        ("ImageText_search_insert", "AFTER INSERT ON ImageText", SEARCH_ROW_SQL.format(id="NEW.id")),
+        ("ImageText_search_update", "AFTER UPDATE OF text ON ImageText", SEARCH_ROW_SQL.format(id="NEW.id")),
+        ("ImageText_search_delete", "AFTER DELETE ON ImageText", "DELETE FROM QuestionSearch WHERE rowid = OLD.id;"),
+        # Inserting or deleting CleanedData writes Answers, whose triggers below cover those cases
+        ("CleanedData_search_update", "AFTER UPDATE OF cleaned_question ON CleanedData",
+         SEARCH_ROW_SQL.format(id="NEW.question_id")),
+        ("Answers_search_insert", "AFTER INSERT ON Answers", SEARCH_ROW_SQL.format(id="NEW.question_id")),
+        ("Answers_search_update", "AFTER UPDATE OF text ON Answers", SEARCH_ROW_SQL.format(id="NEW.question_id")),
+        ("Answers_search_delete", "AFTER DELETE ON Answers", SEARCH_ROW_SQL.format(id="OLD.question_id")),
+    ]
+    for name, event, body in triggers:
+        conn.execute(f"CREATE TRIGGER {name} {event} BEGIN {body} END")
+
+# Queues one question for refresh_search_index; a question queued twice is still rebuilt once
+SEARCH_PENDING_SQL = """
+    INSERT INTO SearchPending (question_id) SELECT {id}
+    WHERE {id} IS NOT NULL AND NOT EXISTS (SELECT 1 FROM SearchPending WHERE question_id = {id});
+"""
+
+def refresh_search_index(conn):
+    """Rebuild the QuestionSearch rows of every question in SearchPending, then empty it."""
+    conn.execute("DELETE FROM QuestionSearch WHERE rowid IN (SELECT question_id FROM SearchPending)")
+    conn.execute("""
+        INSERT INTO QuestionSearch (rowid, text, cleaned_question, answers)
+        SELECT ImageText.id, ImageText.text, CleanedData.cleaned_question,
+               (SELECT group_concat(text, ' ') FROM Answers WHERE Answers.question_id = ImageText.id)
+        FROM ImageText LEFT JOIN CleanedData ON CleanedData.question_id = ImageText.id
+        WHERE ImageText.id IN (SELECT question_id FROM SearchPending)
+    """)
+    conn.execute("DELETE FROM SearchPending")
+
+def migration_6_question_duplicates(conn):
+    """Add QuestionDuplicates, filled by DuplicateQuestions.py.
+
+    Every question in a cluster of near-identical questions has a row whose
+    cluster_id is the cluster's representative question.
+    """
+    conn.execute("""
+        CREATE TABLE QuestionDuplicates (
+            question_id INTEGER PRIMARY KEY,
+            cluster_id INTEGER NOT NULL,
+            similarity REAL
+        )
+    """)
+    conn.execute("CREATE INDEX idx_QuestionDuplicates_cluster_id ON QuestionDuplicates (cluster_id)")
+
+def status_sql(row):
+    """SQL for the CleanedDataStats status of a CleanedData row: 'fixed', 'unfixed' or the raw fixed value."""
+    return (f"CASE WHEN {row}.fixed = 1 THEN 'fixed' WHEN {row}.fixed IS NULL THEN 'unfixed' "
+            f"ELSE CAST({row}.fixed AS TEXT) END")
+
+def stats_change_sql(row, delta):
+    """SQL adding delta to the count of a CleanedData row's status."""
+    return (f"INSERT INTO CleanedDataStats (status, count) VALUES ({status_sql(row)}, {delta}) "
+            f"ON CONFLICT(status) DO UPDATE SET count = count + {delta};")
+
+def fill_stats(conn):
+    """Fill an empty CleanedDataStats table by counting CleanedData."""
+    conn.execute(f"""
+        INSERT INTO CleanedDataStats (status, count)
+        SELECT {status_sql('CleanedData')}, COUNT(*) FROM CleanedData GROUP BY 1
+    """)
+
+def migration_7_stats(conn):
+    """Add CleanedDataStats, the number of CleanedData rows per fixed status, kept current by triggers."""
+    conn.execute("CREATE TABLE CleanedDataStats (status TEXT PRIMARY KEY, count INTEGER NOT NULL)")
+    fill_stats(conn)
+    conn.execute(f"""
+        CREATE TRIGGER CleanedData_stats_insert AFTER INSERT ON CleanedData
+        BEGIN {stats_change_sql('NEW', 1)} END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER CleanedData_stats_delete AFTER DELETE ON CleanedData
+        BEGIN {stats_change_sql('OLD', -1)} END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER CleanedData_stats_update AFTER UPDATE OF fixed ON CleanedData
+        WHEN OLD.fixed IS NOT NEW.fixed
+        BEGIN {stats_change_sql('OLD', -1)} {stats_change_sql('NEW', 1)} END
+    """)
+
+def migration_8_fixed_at(conn):
+    """Record when each CleanedData row was last saved in the editor, so merges can tell which fix is newest."""
+    conn.execute("ALTER TABLE CleanedData ADD COLUMN fixed_at REAL")
+
+def migration_9_search_pending(conn):
+    """Refresh QuestionSearch once per changed question instead of once per trigger.
+
+    Saving a question in the editor updates ImageText and CleanedData, whose triggers
+    rewrite all four Answers rows, and each of those writes rebuilt the question's
+    search row again. The triggers now only queue the question in SearchPending, and
+    refresh_search_index rebuilds each queued question once (QuestionRepository does
+    so after saving and before searching).
+    """
+    conn.execute("CREATE TABLE SearchPending (question_id INTEGER PRIMARY KEY)")
+    triggers = [
+        ("ImageText_search_insert", "AFTER INSERT ON ImageText", "NEW.id"),
+        ("ImageText_search_update", "AFTER UPDATE OF text ON ImageText", "NEW.id"),
+        ("ImageText_search_delete", "AFTER DELETE ON ImageText", "OLD.id"),
+        ("CleanedData_search_update", "AFTER UPDATE OF cleaned_question ON CleanedData", "NEW.question_id"),
+        ("Answers_search_insert", "AFTER INSERT ON Answers", "NEW.question_id"),
+        ("Answers_search_update", "AFTER UPDATE OF text ON Answers", "NEW.question_id"),
+        ("Answers_search_delete", "AFTER DELETE ON Answers", "OLD.question_id"),
+    ]
+    for name, event, question_id in triggers:
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+        conn.execute(f"CREATE TRIGGER {name} {event} BEGIN {SEARCH_PENDING_SQL.format(id=question_id)} END")
+
+def migration_10_parse_failures(conn):
+    """Add ParseFailures: the ImageText text each parser could not parse, so unchanged rows are not retried.
+
+    parser names the parse function (see Formatter.parser_name), since a row one
+    parser fails on may still parse with another.
+    """
+    conn.execute("""
+        CREATE TABLE ParseFailures (
+            question_id INTEGER NOT NULL,
+            parser TEXT NOT NULL,
+            source_hash TEXT NOT NULL,
+            error TEXT,
+            PRIMARY KEY (question_id, parser)
+        ) WITHOUT ROWID
+    """)
+
+MIGRATIONS = [
+    (1, migration_1_base_tables),
+    (2, migration_2_answers_table),
+    (3, migration_3_indexes),
+    (4, migration_4_source_hash),
+    (5, migration_5_search_index),
+    (6, migration_6_question_duplicates),
+    (7, migration_7_stats),
+    (8, migration_8_fixed_at),
+    (9, migration_9_search_pending),
+    (10, migration_10_parse_failures),
+]
+
+def progress_migration_1_learner_progress(conn):
+    """Create LearnerProgress: each learner's Leitner box and due time per question (see SpacedRepetition.py)."""
+    conn.execute("""
+        CREATE TABLE LearnerProgress (
+            learner TEXT NOT NULL,
+            question_id INTEGER NOT NULL,
+            box INTEGER NOT NULL,
+            due REAL NOT NULL,
+            correct_count INTEGER NOT NULL DEFAULT 0,
+            wrong_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (learner, question_id)
+        ) WITHOUT ROWID
+    """)
+
+# Learner progress lives in its own database file, so answering questions never makes
+# the question database newer than a compiled quiz bundle (see QuizBundle.is_current)
+PROGRESS_MIGRATIONS = [
+    (1, progress_migration_1_learner_progress),
+]
+
+def rebuild_derived_tables(conn):
+    """Recompute Answers, QuestionSearch and CleanedDataStats from ImageText and CleanedData."""
+    conn.execute("DELETE FROM Answers")
+    fill_answers(conn)
+    conn.execute("DELETE FROM QuestionSearch")
+    fill_search_index(conn)
+    conn.execute("DELETE FROM SearchPending")
+    conn.execute("DELETE FROM CleanedDataStats")
+    fill_stats(conn)
+
+@contextmanager
+def triggers_dropped(conn):
+    """Drop every trigger for the duration of a bulk load, then recreate them.
+
+    Use inside a transaction, and call rebuild_derived_tables before leaving, since
+    nothing keeps the derived tables current in between.
+    """
+    triggers = conn.execute("SELECT name, sql FROM sqlite_master WHERE type = 'trigger'").fetchall()
+    for name, _ in triggers:
+        conn.execute(f"DROP TRIGGER {name}")
+    try:
+        yield
+    finally:
+        for _, sql in triggers:
+            conn.execute(sql)
+
+def schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def migrate(conn, migrations=MIGRATIONS):
+    """Apply every migration newer than the database's schema version. Returns the new version."""
+    version = schema_version(conn)
+    for target, migration in migrations:
+        if target <= version:
+            continue
+        # Each migration and its version bump commit together or not at all
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Another connection may have applied it while we waited for the write lock
+            if schema_version(conn) < target:
+                migration(conn)
+                conn.execute(f"PRAGMA user_version = {target}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        version = target
+    return version
+
+def migrate_file(db_path):
+    """Upgrade one database file and return (old version, new version)."""
+    conn = sqlite3.connect(db_path)
+    try:
+        old_version = schema_version(conn)
+        return old_version, migrate(conn)
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    # Usage: python Migrations.py Question_DB.db Backup/*.db
+    for path in sys.argv[1:] or ["Question_DB.db"]:
+        old_version, new_version = migrate_file(path)
+        print(f"{path}: schema version {old_version} -> {new_version}")
@@ -0,0 +1,35 @@
+from itertools import groupby
+from operator import itemgetter
+
+class QuizQuestion:
+    """One quiz question with its answers and a precomputed is-correct flag per answer."""
+    __slots__ = ("id", "filename", "text", "answers", "correct")
+
+    def __init__(self, id, filename, text, answers, correct):
+        self.id = id
+        self.filename = filename
+        self.text = text
+        self.answers = answers
+        self.correct = correct
+
+    def is_right(self, selected):
+        """Return True if the selected flags match the correct answers exactly."""
+        return tuple(selected) == self.correct
+
+    def has_wrong_choice(self, selected):
+        """Return True if any selected answer is not a correct one."""
+        return any(chosen and not correct for chosen, correct in zip(selected, self.correct))
+
+def make_question(rows):
+    """Build a QuizQuestion from the position-ordered (id, filename, text, position, answer_text, is_correct)
+    rows of one question."""
+    question_id, filename, text = rows[0][:3]
+    answers = tuple(row[4] or "" for row in rows)
+    return QuizQuestion(question_id, filename, text, answers, tuple(bool(row[5]) for row in rows))
+
+def load_fixed_questions(db_path):
+    """Load every fixed question with its answers in one query."""
+    # Imported here so reading a quiz bundle never loads sqlite3
+    import Database
+    rows = Database.get_repository(db_path).get_quiz_rows()
+    return [make_question(list(group)) for _, group in groupby(rows, key=itemgetter(0))]
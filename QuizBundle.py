@@ -0,0 +1,177 @@
+import argparse
+import io
+import mmap
+import os
+import struct
+import time
+
+import Config
+import QuizBank
+
+# A quiz bundle is one read-only file holding every quiz question and its display image:
+#
+#   header   MAGIC, version, question count
+#   index    one INDEX_RECORD per question: id, then offset and length of its record and its image
+#   records  per question: correct-answer bitmask, answer count, then filename, text and
+#            answers, each a little-endian u16 byte length followed by UTF-8
+#   images   the QUIZ_SIZE JPEG of each question
+#
+# The file is memory-mapped and a question is only decoded when the quiz shows it.
+MAGIC = b"QZB1"
+VERSION = 1
+HEADER = struct.Struct("<4sII")
+INDEX_RECORD = struct.Struct("<IQIQI")
+RECORD_HEAD = struct.Struct("<BB")
+STRING_LENGTH = struct.Struct("<H")
+
+def encode_record(question):
+    correct_mask = sum(1 << i for i, correct in enumerate(question.correct) if correct)
+    parts = [RECORD_HEAD.pack(correct_mask, len(question.answers))]
+    for string in (question.filename, question.text or "", *question.answers):
+        data = string.encode("utf-8")
+        parts.append(STRING_LENGTH.pack(len(data)))
+        parts.append(data)
+    return b"".join(parts)
+
+def decode_record(question_id, data):
+    correct_mask, answer_count = RECORD_HEAD.unpack_from(data, 0)
+    offset = RECORD_HEAD.size
+    strings = []
+    for _ in range(2 + answer_count):
+        (length,) = STRING_LENGTH.unpack_from(data, offset)
+        offset += STRING_LENGTH.size
+        strings.append(data[offset:offset + length].decode("utf-8"))
+        offset += length
+    filename, text, *answers = strings
+    correct = tuple(bool(correct_mask & (1 << i)) for i in range(answer_count))
+    return QuizBank.QuizQuestion(question_id, filename, text, tuple(answers), correct)
+
+def build_bundle(db_path, image_folder, bundle_path=None):
+    """Compile every fixed question and its display image into a bundle file. Returns the question count.
+
+    bundle_path defaults to the configured bundle (see Config).
+    """
+    import Database
+    import DisplayImages
+
+    bundle_path = bundle_path or Config.get("bundle")
+
+    questions = QuizBank.load_fixed_questions(db_path)
+    # Closing checkpoints the WAL into the database file now, so it is not newer than the bundle
+    Database.get_repository(db_path).close()
+    records = [encode_record(question) for question in questions]
+    images = []
+    for question in questions:
+        image_path = os.path.join(image_folder, question.filename)
+        try:
+            # Make sure the display copy is current, then pack its JPEG bytes as they are
+            DisplayImages.get_display_image(image_path, DisplayImages.QUIZ_SIZE)
+            with open(DisplayImages.derivative_path(image_path, DisplayImages.QUIZ_SIZE), "rb") as f:
+                images.append(f.read())
+        except OSError as e:
+            print(f"No image for question {question.id}: {e}")
+            images.append(b"")
+
+    offset = HEADER.size + INDEX_RECORD.size * len(questions)
+    index = []
+    for question, record in zip(questions, records):
+        index.append([question.id, offset, len(record), 0, 0])
+        offset += len(record)
+    for entry, image in zip(index, images):
+        entry[3:] = [offset, len(image)]
+        offset += len(image)
+
+    tmp_path = f"{bundle_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(questions)))
+        for entry in index:
+            f.write(INDEX_RECORD.pack(*entry))
+        for record in records:
+            f.write(record)
+        for image in images:
+            f.write(image)
+    os.replace(tmp_path, bundle_path)
+    return len(questions)
+
+def is_current(bundle_path=None, db_path=None):
+    """Return True if the bundle exists and is at least as new as the database (or there is no database).
+
+    Either path defaults to the configured one (see Config).
+    """
+    bundle_path = bundle_path or Config.get("bundle")
+    db_path = db_path or Config.get("db")
+    if not os.path.exists(bundle_path):
+        return False
+    # With WAL journaling recent writes may only have reached the -wal file
+    db_mtimes = [os.path.getmtime(path) for path in (db_path, f"{db_path}-wal") if os.path.exists(path)]
+    return not db_mtimes or os.path.getmtime(bundle_path) >= max(db_mtimes)
+
+class QuizBundle:
+    """Read-only, memory-mapped view of a quiz bundle that acts as a sequence of QuizQuestions.
+
+    bundle_path defaults to the configured bundle (see Config).
+    """
+
+    def __init__(self, bundle_path=None):
+        bundle_path = bundle_path or Config.get("bundle")
+        with open(bundle_path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self._count = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{bundle_path} is not a version {VERSION} quiz bundle")
+        self._questions = {}
+        self._positions = None
+
+    def __len__(self):
+        return self._count
+
+    def _entry(self, position):
+        if not 0 <= position < self._count:
+            raise IndexError(position)
+        return INDEX_RECORD.unpack_from(self._mmap, HEADER.size + position * INDEX_RECORD.size)
+
+    def __getitem__(self, position):
+        question = self._questions.get(position)
+        if question is None:
+            question_id, offset, length, _, _ = self._entry(position)
+            question = self._questions[position] = decode_record(question_id, self._mmap[offset:offset + length])
+        return question
+
+    def question_ids(self):
+        """Return every question id in position order, reading only the index."""
+        return [self._entry(position)[0] for position in range(self._count)]
+
+    def position_of(self, question_id):
+        """Return the position of a question id in the bundle."""
+        if self._positions is None:
+            self._positions = {self._entry(position)[0]: position for position in range(self._count)}
+        return self._positions[question_id]
+
+    def get_image(self, question_id):
+        """Return the display image of a question, or None if the bundle has none."""
+        _, _, _, offset, length = self._entry(self.position_of(question_id))
+        if not length:
+            return None
+        from PIL import Image
+        img = Image.open(io.BytesIO(self._mmap[offset:offset + length]))
+        img.load()
+        return img
+
+    def close(self):
+        self._mmap.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile the fixed questions into a read-only quiz bundle.")
+    parser.add_argument("-o", "--output", help="bundle file to write (default: the configured bundle)")
+    # Adds --config, --db, --images, --bundle and --progress
+    args = Config.parse_args(parser=parser)
+    output = args.output or Config.get("bundle")
+
+    start = time.perf_counter()
+    count = build_bundle(Config.get("db"), Config.get("images"), output)
+    print(f"Wrote {count} questions to {output} ({os.path.getsize(output)} bytes, "
+          f"{time.perf_counter() - start:.2f}s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import math
+import random
+
+# Outcomes of QuizSession.answer()
+CORRECT = "correct"
+WRONG = "wrong"
+
+def question_ids(bank):
+    """Return the question ids of a bank in position order, without decoding a bundle's questions."""
+    if hasattr(bank, "question_ids"):
+        return bank.question_ids()
+    return [question.id for question in bank]
+
+class QuizSession:
+    """One person's run through a question bank, without any GUI.
+
+    bank is any sequence of QuizBank.QuizQuestion (a list from QuizBank or a
+    QuizBundle). Sessions never copy it: the shuffled order is the affine
+    permutation i -> (step * i + offset) mod len(bank), so a session without a
+    scheduler is a few integers (about 120 bytes) however large the bank is, and a
+    server can hold thousands of them.
+
+    With a scheduler (see SpacedRepetition.LeitnerScheduler) the scheduler picks the
+    questions instead, and the first right or wrong answer to each is recorded in it.
+    Such a session also maps every question id to its position, and the scheduler
+    keeps state per question, so its size grows with the bank; it is meant for one
+    learner at a time, as in Tester.py.
+    """
+    __slots__ = ("bank", "step", "offset", "index", "score", "total", "last_seen",
+                 "scheduler", "positions", "current", "recorded")
+
+    def __init__(self, bank, rng=random, scheduler=None):
+        self.bank = bank
+        size = len(bank)
+        if not size:
+            raise ValueError("The question bank is empty")
+        # Any step coprime with the bank size visits every question exactly once per round
+        self.step = rng.randrange(1, size) if size > 1 else 1
+        while math.gcd(self.step, size) != 1:
+            self.step += 1
+        self.offset = rng.randrange(size)
+        self.index = 0
+        self.score = 0
+        self.total = 0
+        self.last_seen = 0.0
+        self.scheduler = scheduler
+        self.positions = None
+        self.recorded = False
+        if scheduler is not None:
+            self.positions = {question_id: position for position, question_id in enumerate(question_ids(bank))}
+            self.current = self.positions[scheduler.take()]
+
+    def position(self, ahead=0):
+        """Return the bank position of the question ahead questions after the current one."""
+        if self.scheduler is not None and not ahead:
+            return self.current
+        return (self.step * (self.index + ahead) + self.offset) % len(self.bank)
+
+    @property
+    def question(self):
+        return self.bank[self.position()]
+
+    def upcoming(self, ahead):
+        """Return the questions navigation shows next: ahead after the current one, then ahead before it."""
+        if self.scheduler is not None:
+            return [self.bank[self.positions[question_id]] for question_id in self.scheduler.peek(ahead)]
+        offsets = list(range(1, ahead + 1)) + [-offset for offset in range(1, ahead + 1) if offset <= self.index]
+        return [self.bank[self.position(offset)] for offset in offsets]
+
+    def answer(self, selected):
+        """Score the selected flags of the current question.
+
+        Returns CORRECT if they are exactly the correct answers, WRONG if any selected
+        answer is wrong, and None if the selection is right so far but incomplete.
+        Every call counts as an attempt, as every click does in the quiz window.
+        """
+        question = self.question
+        self.total += 1
+        if question.is_right(selected):
+            self.score += 1
+            result = CORRECT
+        elif question.has_wrong_choice(selected):
+            result = WRONG
+        else:
+            return None
+        if self.scheduler is not None and not self.recorded:
+            self.scheduler.record(question.id, result == CORRECT)
+            self.recorded = True
+        return result
+
+    def next(self):
+        """Move to the next question, starting a new round after the last one."""
+        if self.scheduler is not None:
+            if not self.recorded:
+                self.scheduler.release(self.question.id)
+            self.recorded = False
+            self.current = self.positions[self.scheduler.take()]
+            return self.question
+        self.index = (self.index + 1) % len(self.bank)
+        return self.question
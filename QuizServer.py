@@ -0,0 +1,210 @@
+import argparse
+import asyncio
+import json
+import logging
+import secrets
+import time
+
+import Config
+import QuizEngine
+
+# A small HTTP/JSON server that lets many trainees take the quiz at once from one
+# process. The question bank is loaded once and shared; each session is a
+# QuizEngine.QuizSession without a scheduler, a few integers.
+#
+#   POST   /sessions                 start a session     -> {"session", "question"}
+#   GET    /sessions/<id>            current question    -> {"question"}
+#   POST   /sessions/<id>/answer     {"selected": [bool, bool, bool, bool]}
+#                                                        -> {"result", "score", "total"[, "correct"]}
+#   POST   /sessions/<id>/next       next question       -> {"question"}
+#   DELETE /sessions/<id>            end the session
+#   GET    /stats                    session and request counts
+#
+# "result" is "correct", "wrong" or null for a selection that is right so far but
+# incomplete; "correct" (the correct-answer flags) is only sent once there is a result.
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+# Sessions nobody has used for this long are dropped
+SESSION_TTL = 2 * 60 * 60
+# Requests with a larger head or body are refused
+MAX_HEAD = 8 * 1024
+MAX_BODY = 16 * 1024
+
+REASONS = {200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 431: "Request Header Fields Too Large", 500: "Internal Server Error"}
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+def load_bank():
+    """Load the quiz bank once: the compiled bundle if it is current, otherwise the database."""
+    import QuizBundle
+    if QuizBundle.is_current(Config.get("bundle"), Config.get("db")):
+        return QuizBundle.QuizBundle(Config.get("bundle"))
+    import QuizBank
+    return QuizBank.load_fixed_questions(Config.get("db"))
+
+def question_json(question):
+    return {"id": question.id, "text": question.text, "answers": list(question.answers)}
+
+def encode_response(status, payload, keep_alive):
+    body = json.dumps(payload).encode("utf-8")
+    head = (f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    return head.encode("latin-1") + body
+
+class QuizServer:
+    """Routes quiz requests to in-memory sessions. Everything runs on one asyncio event loop."""
+
+    def __init__(self, bank, ttl=SESSION_TTL):
+        self.bank = bank
+        self.ttl = ttl
+        self.sessions = {}
+        self.requests = 0
+
+    def session(self, session_id):
+        session = self.sessions.get(session_id)
+        if session is None:
+            raise HTTPError(404, f"No session {session_id}")
+        session.last_seen = time.monotonic()
+        return session
+
+    def route(self, method, path, data):
+        """Handle one request. Returns (status, payload)."""
+        parts = path.split("?", 1)[0].strip("/").split("/")
+        if parts == ["sessions"]:
+            if method != "POST":
+                raise HTTPError(405, "Use POST to start a session")
+            session_id = secrets.token_urlsafe(12)
+            session = self.sessions[session_id] = QuizEngine.QuizSession(self.bank)
+            session.last_seen = time.monotonic()
+            return 201, {"session": session_id, "question": question_json(session.question)}
+        if parts == ["stats"] and method == "GET":
+            return 200, {"sessions": len(self.sessions), "requests": self.requests, "questions": len(self.bank)}
+        if parts[0] != "sessions" or len(parts) not in (2, 3):
+            raise HTTPError(404, f"No such resource {path}")
+
+        session = self.session(parts[1])
+        action = parts[2] if len(parts) == 3 else None
+        if action is None and method == "GET":
+            return 200, {"question": question_json(session.question), "score": session.score, "total": session.total}
+        if action is None and method == "DELETE":
+            del self.sessions[parts[1]]
+            return 200, {"score": session.score, "total": session.total}
+        if action == "answer" and method == "POST":
+            selected = data.get("selected")
+            question = session.question
+            if (not isinstance(selected, list) or len(selected) != len(question.answers)
+                    or not all(isinstance(flag, bool) for flag in selected)):
+                raise HTTPError(400, f"selected must be a list of {len(question.answers)} booleans")
+            result = session.answer(selected)
+            payload = {"result": result, "score": session.score, "total": session.total}
+            if result is not None:
+                payload["correct"] = list(question.correct)
+            return 200, payload
+        if action == "next" and method == "POST":
+            return 200, {"question": question_json(session.next())}
+        if action in (None, "answer", "next"):
+            raise HTTPError(405, f"{method} is not allowed on {path}")
+        raise HTTPError(404, f"No such resource {path}")
+
+    def respond(self, method, path, body):
+        self.requests += 1
+        try:
+            try:
+                data = json.loads(body) if body else {}
+            except (ValueError, RecursionError):
+                # RecursionError: nested too deeply for the parser
+                raise HTTPError(400, "The body is not valid JSON")
+            if not isinstance(data, dict):
+                raise HTTPError(400, "The body must be a JSON object")
+            return self.route(method, path, data)
+        except HTTPError as e:
+            return e.status, {"error": str(e)}
+        except Exception:
+            # A bug in one request must not drop the connection without an answer
+            logging.exception(f"Error handling {method} {path}")
+            return 500, {"error": "Internal server error"}
+
+    async def handle(self, reader, writer):
+        """Serve the requests of one connection, keeping it open between requests."""
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except asyncio.LimitOverrunError:
+                    writer.write(encode_response(431, {"error": "Request head too large"}, False))
+                    break
+                request_line, *header_lines = head.decode("latin-1").rstrip("\r\n").split("\r\n")
+                try:
+                    method, path, version = request_line.split(" ", 2)
+                    headers = {}
+                    for line in header_lines:
+                        name, _, value = line.partition(":")
+                        headers[name.strip().lower()] = value.strip()
+                    length = int(headers.get("content-length", 0))
+                    if length < 0:
+                        raise ValueError("negative Content-Length")
+                except ValueError:
+                    writer.write(encode_response(400, {"error": "Malformed request"}, False))
+                    break
+                if length > MAX_BODY:
+                    writer.write(encode_response(413, {"error": "Request body too large"}, False))
+                    break
+                try:
+                    body = await reader.readexactly(length) if length else b""
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+
+                connection = headers.get("connection", "").lower()
+                keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+                status, payload = self.respond(method, path, body)
+                writer.write(encode_response(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def expire_sessions(self):
+        while True:
+            await asyncio.sleep(min(self.ttl, 60))
+            cutoff = time.monotonic() - self.ttl
+            for session_id in [session_id for session_id, session in self.sessions.items()
+                               if session.last_seen < cutoff]:
+                del self.sessions[session_id]
+
+    async def serve(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        server = await asyncio.start_server(self.handle, host, port, limit=MAX_HEAD, backlog=1024)
+        expiry = asyncio.create_task(self.expire_sessions())
+        address = server.sockets[0].getsockname()
+        # ServerBenchmark.py reads the port from this line when it starts the server itself
+        print(f"Serving {len(self.bank)} questions on http://{address[0]}:{address[1]}", flush=True)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            expiry.cancel()
+
+def main():
+    parser = argparse.ArgumentParser(description="Host quiz sessions for many trainees over HTTP/JSON.")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="address to listen on")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="port to listen on (0 picks a free one)")
+    args = Config.parse_args(parser=parser)
+
+    server = QuizServer(load_bank())
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+import queue
+import threading
+import time
+
+# After the first save arrives the writer waits this long, so a burst of saves from
+# clicking through questions shares one transaction
+BATCH_DELAY = 0.2
+
+class SaveQueue:
+    """Write edited questions to the database on a background thread.
+
+    save() only records the edit and returns. Edits to the same question that have not
+    been written yet are coalesced, so only the newest one is written, and everything
+    queued while the writer waited is written in one transaction. If that transaction
+    fails, the edits are written one by one so only the failing ones are lost. The
+    outcome of each write is put on a queue the GUI thread reads with results(), since tkinter
+    widgets must not be touched from other threads.
+    """
+
+    def __init__(self, repository, batch_delay=BATCH_DELAY):
+        self.repository = repository
+        self.batch_delay = batch_delay
+        self._pending = {}
+        self._writing = False
+        self._closed = False
+        self._condition = threading.Condition()
+        self._results = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="SaveQueue", daemon=True)
+        self._thread.start()
+
+    def save(self, question_id, cleaned_text, answers):
+        """Queue the cleaned text and (answer_text, is_correct) pairs of a question."""
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("SaveQueue is closed")
+            self._pending[question_id] = (cleaned_text, list(answers))
+            self._condition.notify_all()
+
+    def pending_edit(self, question_id):
+        """Return the queued (cleaned_text, answers) of a question not written yet, or None."""
+        with self._condition:
+            return self._pending.get(question_id)
+
+    def results(self):
+        """Return the (question_ids, error, unfixed_count) of every transaction finished since the last call.
+
+        error is None on success; unfixed_count is None on failure.
+        """
+        results = []
+        while True:
+            try:
+                results.append(self._results.get_nowait())
+            except queue.Empty:
+                return results
+
+    def flush(self, timeout=None):
+        """Wait until every queued save is written. Returns False if timeout ran out first."""
+        with self._condition:
+            return self._condition.wait_for(lambda: not self._pending and not self._writing, timeout)
+
+    def close(self):
+        """Write what is still queued, then stop the writer thread."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._pending or self._closed)
+                if not self._pending:
+                    return
+                self._writing = True
+                self._condition.wait_for(lambda: self._closed, self.batch_delay)
+                batch = dict(self._pending)
+
+            failures = {}
+            try:
+                self.repository.update_questions(self._edits(batch))
+            except Exception as e:
+                if len(batch) == 1:
+                    failures = dict.fromkeys(batch, e)
+                else:
+                    # Write the edits one at a time, so only the ones that fail are lost
+                    for question_id, edit in batch.items():
+                        try:
+                            self.repository.update_questions(self._edits({question_id: edit}))
+                        except Exception as failure:
+                            failures[question_id] = failure
+            saved = [question_id for question_id in batch if question_id not in failures]
+            error = unfixed_count = None
+            if saved:
+                try:
+                    unfixed_count = self.repository.get_unfixed_count()
+                except Exception as e:
+                    error = e
+
+            with self._condition:
+                # Failed edits are dropped too: retrying would fail the same way, and each is reported
+                for question_id, edit in batch.items():
+                    if self._pending.get(question_id) is edit:
+                        del self._pending[question_id]
+                self._writing = False
+                self._condition.notify_all()
+            if saved:
+                self._results.put((saved, error, unfixed_count))
+            for question_id, failure in failures.items():
+                self._results.put(([question_id], failure, None))
+
+    @staticmethod
+    def _edits(batch):
+        return [(question_id, cleaned_text, answers) for question_id, (cleaned_text, answers) in batch.items()]
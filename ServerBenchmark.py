@@ -0,0 +1,129 @@
+import argparse
+import asyncio
+import json
+import math
+import random
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+import QuizServer
+
+# Load test for QuizServer.py: many simulated trainees, each on its own keep-alive
+# connection, start a session and answer-then-advance through rounds questions at once.
+
+async def request(reader, writer, method, path, payload=None):
+    """Send one request on an open connection. Returns (status, decoded JSON body)."""
+    body = json.dumps(payload).encode("utf-8") if payload is not None else b""
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: quiz\r\nContent-Type: application/json\r\n"
+                 f"Content-Length: {len(body)}\r\n\r\n".encode("latin-1") + body)
+    head = await reader.readuntil(b"\r\n\r\n")
+    status_line, *header_lines = head.decode("latin-1").rstrip("\r\n").split("\r\n")
+    length = 0
+    for line in header_lines:
+        name, _, value = line.partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    return int(status_line.split(" ", 2)[1]), json.loads(await reader.readexactly(length))
+
+async def trainee(host, port, rounds, latencies, errors, rng):
+    """Take rounds questions: answer each with a random single choice, then go to the next."""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        async def timed(method, path, payload=None):
+            start = time.perf_counter()
+            status, data = await request(reader, writer, method, path, payload)
+            latencies.append(time.perf_counter() - start)
+            if status >= 400:
+                errors.append(f"{method} {path}: {status} {data.get('error')}")
+            return data
+
+        data = await timed("POST", "/sessions")
+        session = f"/sessions/{data['session']}"
+        answer_count = len(data["question"]["answers"])
+        for _ in range(rounds):
+            choice = rng.randrange(answer_count)
+            await timed("POST", f"{session}/answer", {"selected": [i == choice for i in range(answer_count)]})
+            answer_count = len((await timed("POST", f"{session}/next"))["question"]["answers"])
+        await timed("DELETE", session)
+    finally:
+        writer.close()
+
+async def run_load(host, port, sessions, rounds, seed=0):
+    latencies, errors = [], []
+    rng = random.Random(seed)
+    start = time.perf_counter()
+    results = await asyncio.gather(*(trainee(host, port, rounds, latencies, errors, random.Random(rng.random()))
+                                     for _ in range(sessions)), return_exceptions=True)
+    elapsed = time.perf_counter() - start
+    errors.extend(f"trainee failed: {result!r}" for result in results if isinstance(result, Exception))
+    return latencies, errors, elapsed
+
+def summarize(latencies, elapsed):
+    """Return throughput and latency percentiles (in milliseconds) of a run."""
+    ordered = sorted(latencies)
+    def percentile(fraction):
+        return ordered[max(0, math.ceil(len(ordered) * fraction) - 1)] * 1000 if ordered else 0.0
+    return {
+        "requests": len(ordered),
+        "seconds": round(elapsed, 3),
+        "requests_per_s": round(len(ordered) / elapsed, 1) if elapsed else 0.0,
+        "mean_ms": round(statistics.mean(ordered) * 1000, 2) if ordered else 0.0,
+        "median_ms": round(percentile(0.5), 2),
+        "p95_ms": round(percentile(0.95), 2),
+        "p99_ms": round(percentile(0.99), 2),
+    }
+
+def start_server(extra_args):
+    """Start QuizServer.py on a free port. Returns (process, port)."""
+    process = subprocess.Popen([sys.executable, QuizServer.__file__, "--port", "0", *extra_args],
+                               stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline()
+    match = re.search(r":(\d+)$", line.strip())
+    if not match:
+        process.kill()
+        raise RuntimeError(f"QuizServer.py did not start: {line!r}")
+    return process, int(match.group(1))
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the quiz server with many concurrent trainees.")
+    parser.add_argument("--sessions", type=int, default=500, help="simultaneous trainees")
+    parser.add_argument("--rounds", type=int, default=20, help="questions each trainee answers")
+    parser.add_argument("--host", default=QuizServer.DEFAULT_HOST)
+    parser.add_argument("--port", type=int, help="test a running server instead of starting one")
+    parser.add_argument("--db", help="question database for the server this starts")
+    parser.add_argument("--bundle", help="quiz bundle for the server this starts")
+    parser.add_argument("--min-rps", type=float, default=0, help="fail if throughput is below this")
+    parser.add_argument("--report", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    process = None
+    port = args.port
+    if port is None:
+        extra = [arg for name in ("db", "bundle") if getattr(args, name)
+                 for arg in (f"--{name}", getattr(args, name))]
+        process, port = start_server(extra)
+    try:
+        latencies, errors, elapsed = asyncio.run(run_load(args.host, port, args.sessions, args.rounds))
+    finally:
+        if process:
+            process.terminate()
+            process.wait()
+
+    report = dict(summarize(latencies, elapsed), sessions=args.sessions, rounds=args.rounds, errors=len(errors))
+    print(f"{args.sessions} trainees x {args.rounds} questions: {report['requests']} requests in "
+          f"{report['seconds']}s = {report['requests_per_s']} req/s")
+    print(f"latency ms: mean {report['mean_ms']}  median {report['median_ms']}  "
+          f"p95 {report['p95_ms']}  p99 {report['p99_ms']}")
+    for error in errors[:10]:
+        print(f"ERROR {error}")
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+    if errors or report["requests_per_s"] < args.min_rps:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+import heapq
+import random
+import time
+from collections import deque
+
+# Leitner boxes: a right answer moves a question up one box, a wrong one sends it back
+# to the first. A question in box n comes back BOX_INTERVALS[n] seconds after it was
+# answered, so missed questions return within minutes and known ones weeks later.
+BOX_INTERVALS = (60, 10 * 60, 60 * 60, 24 * 60 * 60, 3 * 24 * 60 * 60, 7 * 24 * 60 * 60, 30 * 24 * 60 * 60)
+
+class LeitnerScheduler:
+    """Pick the question a learner should see next.
+
+    Questions answered before wait in a heap ordered by due time. take() returns the
+    most overdue one if any is due, otherwise a question the learner has not seen yet,
+    and only when there are none of those either a question before it is due. Heap
+    entries are not removed when a question is rescheduled; outdated ones are skipped
+    when they reach the top. So taking and recording are O(log n) whatever the size
+    of the bank or the length of the learner's history.
+
+    on_change(question_id, box, due, correct) is called after every recorded answer,
+    to persist it.
+    """
+
+    def __init__(self, question_ids, progress=(), on_change=None, rng=random, clock=time.time):
+        self.on_change = on_change
+        self.clock = clock
+        question_ids = set(question_ids)
+        self._box = {}
+        self._due = {}
+        for question_id, box, due in progress:
+            if question_id in question_ids:
+                self._box[question_id] = min(box, len(BOX_INTERVALS) - 1)
+                self._due[question_id] = due
+        self._heap = [(due, question_id) for question_id, due in self._due.items()]
+        heapq.heapify(self._heap)
+        new = [question_id for question_id in question_ids if question_id not in self._box]
+        rng.shuffle(new)
+        self._new = deque(new)
+
+    def __len__(self):
+        """The number of questions the scheduler can hand out."""
+        return len(self._due) + len(self._new)
+
+    def _pop_stale(self):
+        while self._heap and self._due.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+
+    def due_count(self):
+        """Return how many answered questions are due now. O(n); meant for display, not scheduling."""
+        now = self.clock()
+        return sum(1 for due in self._due.values() if due <= now)
+
+    def take(self):
+        """Return the id of the question to show next and set it aside until record() or release().
+
+        Returns None when every question is taken.
+        """
+        self._pop_stale()
+        if self._heap and (self._heap[0][0] <= self.clock() or not self._new):
+            _, question_id = heapq.heappop(self._heap)
+            del self._due[question_id]
+            return question_id
+        if self._new:
+            return self._new.popleft()
+        return None
+
+    def peek(self, count):
+        """Return the ids take() will probably return next, for prefetching. Does not change anything."""
+        now = self.clock()
+        # The count smallest entries of a heap are all among its first 2^count - 1
+        due = sorted(entry for entry in self._heap[:(1 << count) - 1]
+                     if entry[0] <= now and self._due.get(entry[1]) == entry[0])
+        upcoming = [question_id for _, question_id in due]
+        upcoming.extend(self._new[i] for i in range(min(count, len(self._new))))
+        return upcoming[:count]
+
+    def record(self, question_id, correct):
+        """Schedule a taken question after the learner answered it. Returns its new (box, due)."""
+        box = min(self._box.get(question_id, 0) + 1, len(BOX_INTERVALS) - 1) if correct else 0
+        due = self.clock() + BOX_INTERVALS[box]
+        self._schedule(question_id, box, due)
+        if self.on_change:
+            self.on_change(question_id, box, due, correct)
+        return box, due
+
+    def release(self, question_id):
+        """Put back a taken question the learner skipped without answering."""
+        if question_id in self._box:
+            # Keep its box but let other due questions go first
+            self._schedule(question_id, self._box[question_id], self.clock() + BOX_INTERVALS[0])
+        else:
+            self._new.append(question_id)
+
+    def _schedule(self, question_id, box, due):
+        self._box[question_id] = box
+        self._due[question_id] = due
+        heapq.heappush(self._heap, (due, question_id))
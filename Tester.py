@@ -1,33 +1,71 @@
+import time
+START = time.perf_counter()
+
 import tkinter as tk
 from tkinter import messagebox
-import random
-import sqlite3
-from PIL import Image, ImageTk
 import os
 
-import DataCleaner  # Assuming DataCleaner.py provides questions and answers
+import Config
+import ImagePrefetcher
+import QuizBundle
+import QuizEngine
+import SpacedRepetition
+
+# python Tester.py --startup-time checks that the first question shows within this budget.
+# PIL and the image code are imported only when first needed, so with a current bundle
+# startup is little more than tkinter, one mmap and reading the learner's progress.
+STARTUP_BUDGET = 0.5
 
 class QuizApp:
-    def __init__(self, root):
+    def __init__(self, root, learner):
         self.root = root
         self.root.title("Quiz App")
         
-        self.score = 0
-        self.total_questions = 0
-        self.current_question = 0
+        self.bundle = None
+        self.image_folder = None
+        self.learner = learner
         self.questions = self.get_fixed_questions()
-        random.shuffle(self.questions)
+        # Scoring lives in the GUI-free engine QuizServer.py also uses; the Leitner
+        # scheduler brings missed questions back soon and known ones rarely
+        self.session = QuizEngine.QuizSession(self.questions, scheduler=self.get_scheduler())
+        # Images are only shown after an answer, which leaves time to decode them in the background
+        self.prefetcher = ImagePrefetcher.ImagePrefetcher(self.load_image)
         
         self.create_widgets()
         self.display_question()
 
+    def image_path(self, question):
+        if self.bundle is not None:
+            return question.filename
+        return os.path.join(self.image_folder, question.filename)
+
+    def load_image(self, question):
+        if self.bundle is not None:
+            img = self.bundle.get_image(question.id)
+            if img is None:
+                raise FileNotFoundError("not in the quiz bundle")
+            return img
+        import DisplayImages
+        return DisplayImages.get_display_image(self.image_path(question), DisplayImages.QUIZ_SIZE)
+
     def get_fixed_questions(self):
-        conn = sqlite3.connect(DataCleaner.db_name)
-        cursor = conn.cursor()
-        cursor.execute("SELECT ImageText.id, ImageText.filename, ImageText.text FROM ImageText JOIN CleanedData ON CleanedData.question_id = ImageText.id WHERE CleanedData.fixed = 1")
-        data = cursor.fetchall()
-        conn.close()
-        return data
+        # A compiled bundle (see QuizBundle.py) needs neither the database nor the image folder
+        if QuizBundle.is_current(Config.get("bundle"), Config.get("db")):
+            self.bundle = QuizBundle.QuizBundle(Config.get("bundle"))
+            return self.bundle
+        import QuizBank
+        # Ask for the image folder now if need be; the prefetcher must not open dialogs
+        self.image_folder = Config.image_folder(parent=self.root)
+        # Load the whole bank once; answering and navigating never touch the database
+        return QuizBank.load_fixed_questions(Config.get("db"))
+
+    def get_scheduler(self):
+        import Database
+        progress = Database.get_progress_repository(Config.get("progress"))
+        return SpacedRepetition.LeitnerScheduler(
+            QuizEngine.question_ids(self.questions), progress.get_learner_progress(self.learner),
+            on_change=lambda question_id, box, due, correct:
+                progress.save_progress(self.learner, question_id, box, due, correct))
 
     def create_widgets(self):
         self.question_label = tk.Label(self.root, text="", wraplength=400)
@@ -55,58 +93,38 @@ class QuizApp:
         self.score_label.pack(pady=10)
 
     def display_question(self):
-        question = self.questions[self.current_question]
-        self.question_label.config(text=question[2])  # Assuming the question text is in the third position
+        question = self.session.question
+        self.question_label.config(text=question.text)
         
         self.image_label.config(image="")
         self.image_label.image = None
         self.result_label.config(text="")
         
-        conn = sqlite3.connect(DataCleaner.db_name)
-        try:
-            cursor = conn.cursor()
-            cursor.execute("SELECT answer1, answer2, answer3, answer4, correct FROM CleanedData WHERE question_id = ?", (question[0],))
-            answers = cursor.fetchone()
-        finally:
-            conn.close()
+        for i in range(4):
+            self.answer_checks[i].config(text=question.answers[i])
+            self.answer_vars[i].set(False)
         
-        if answers:
-            correct_answers = answers[4].split('|') if answers[4] else []
-            for i in range(4):
-                self.answer_checks[i].config(text=answers[i])
-                self.answer_vars[i].set(False)
-        else:
-            for i in range(4):
-                self.answer_checks[i].config(text="")
-                self.answer_vars[i].set(False)
+        self.prefetcher.prefetch([question] + self.session.upcoming(ImagePrefetcher.PREFETCH_AHEAD))
 
     def check_answer(self):
-        question = self.questions[self.current_question]
-        conn = sqlite3.connect(DataCleaner.db_name)
-        try:
-            cursor = conn.cursor()
-            cursor.execute("SELECT correct FROM CleanedData WHERE question_id = ?", (question[0],))
-            result = cursor.fetchone()
-            correct_answers = result[0].split('|') if result else []
-        finally:
-            conn.close()
+        question = self.session.question
+        selected = [var.get() for var in self.answer_vars]
         
-        self.total_questions += 1
-        if all(var.get() == (check.cget("text") in correct_answers) for var, check in zip(self.answer_vars, self.answer_checks)):
-            self.score += 1
+        result = self.session.answer(selected)
+        if result == QuizEngine.CORRECT:
             self.result_label.config(text="Correct", fg="green")
-            self.show_image(question[1])
-        elif any(var.get() and check.cget("text") not in correct_answers for var, check in zip(self.answer_vars, self.answer_checks)):
+            self.show_image(question)
+        elif result == QuizEngine.WRONG:
             self.result_label.config(text="Wrong!", fg="red")
-            self.show_image(question[1])
+            self.show_image(question)
         
-        self.score_label.config(text=f"Score: {self.score}/{self.total_questions}")
+        self.score_label.config(text=f"Score: {self.session.score}/{self.session.total}")
 
-    def show_image(self, filename):
-        img_path = os.path.join(DataCleaner.image_folder, filename)
+    def show_image(self, question):
+        img_path = self.image_path(question)
         try:
-            img = Image.open(img_path)
-            img = img.resize((600, 400), Image.LANCZOS)
+            from PIL import ImageTk
+            img = self.prefetcher.get(question)
             img = ImageTk.PhotoImage(img)
             self.image_label.config(image=img)
             self.image_label.image = img
@@ -116,12 +134,26 @@ class QuizApp:
             self.image_label.image = None
 
     def next_question(self):
-        self.current_question += 1
-        if self.current_question >= len(self.questions):
-            self.current_question = 0
+        self.session.next()
         self.display_question()
 
 if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Practice the citizenship quiz.")
+    parser.add_argument("--startup-time", action="store_true",
+                        help=f"print how long it took to show the first question (budget {STARTUP_BUDGET}s)")
+    parser.add_argument("--learner", default=os.environ.get("QUIZ_LEARNER"),
+                        help="whose progress to use (default: QUIZ_LEARNER or the login name)")
+    args = Config.parse_args(parser=parser)
+    if not args.learner:
+        import getpass
+        args.learner = getpass.getuser()
     root = tk.Tk()
-    app = QuizApp(root)
-    root.mainloop()
\ No newline at end of file
+    app = QuizApp(root, args.learner)
+    if args.startup_time:
+        root.update()
+        elapsed = time.perf_counter() - START
+        print(f"First question shown after {elapsed * 1000:.0f} ms "
+              f"({'within' if elapsed <= STARTUP_BUDGET else 'over'} the {STARTUP_BUDGET * 1000:.0f} ms budget)")
+    root.mainloop()
+    app.prefetcher.close()
\ No newline at end of file
@@ -1,7 +1,11 @@
 import tkinter as tk
 from tkinter import messagebox
 import random
+import os
+import sys
 
+# DataCleaner lives in the project root; importing it no longer opens a folder dialog
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import DataCleaner  # Assuming DataCleaner.py provides questions and answers
 
 class QuizApp:
@@ -0,0 +1,187 @@
+import argparse
+import json
+import math
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+from PIL import Image
+
+import Formatter
+import ImgTest2
+import ImgTest3
+import OcrEngine
+
+# Registered pipelines: name -> list of (stage name, function). The first stage is
+# called with the image path and every later stage with the previous stage's output.
+# The last stage must return the OCR text.
+PIPELINES = {}
+
+def register_pipeline(name, stages):
+    """Add a pipeline to the benchmark under the given name."""
+    PIPELINES[name] = stages
+
+def decode_image(image_path):
+    img = Image.open(image_path)
+    img.load()
+    return img
+
+# Same steps as ImgTest.extract_text, timed separately
+register_pipeline('raw', [
+    ('decode', decode_image),
+    ('ocr', OcrEngine.image_to_string),
+])
+register_pipeline('pil_enhance', [
+    ('preprocess', ImgTest2.preprocess_image),
+    ('ocr', ImgTest2.extract_text),
+])
+register_pipeline('opencv_threshold', [
+    ('preprocess', ImgTest3.preprocess_image),
+    ('ocr', ImgTest3.extract_text),
+])
+
+def parses(text):
+    """Return True if Formatter.parse_text_column accepts the OCR text."""
+    try:
+        Formatter.parse_text_column(text)
+        return True
+    except ValueError:
+        return False
+
+def summarize(values):
+    """Return mean/median/p95/total of a list of seconds, in milliseconds."""
+    ordered = sorted(values)
+    return {
+        'mean_ms': statistics.mean(ordered) * 1000,
+        'median_ms': statistics.median(ordered) * 1000,
+        'p95_ms': ordered[max(0, math.ceil(len(ordered) * 0.95) - 1)] * 1000,
+        'total_s': sum(ordered),
+    }
+
+def run_stages(stages, image_path):
+    """Run the stages on one image. Returns (seconds per stage, OCR text, error or None)."""
+    times = {}
+    value = image_path
+    try:
+        for stage_name, stage in stages:
+            stage_start = time.perf_counter()
+            value = stage(value)
+            times[stage_name] = time.perf_counter() - stage_start
+            if value is None:
+                raise ValueError(f"stage {stage_name} returned nothing")
+    except Exception as e:
+        return times, "", str(e)
+    return times, value, None
+
+def measure_peak_memory(stages, image_paths):
+    """Return the peak traced memory of each image's run, in bytes.
+
+    A pass of its own: tracing every allocation slows the stages down too much to
+    time them at the same time.
+    """
+    peaks = []
+    tracemalloc.start()
+    try:
+        for image_path in image_paths:
+            tracemalloc.reset_peak()
+            run_stages(stages, image_path)
+            peaks.append(tracemalloc.get_traced_memory()[1])
+    finally:
+        tracemalloc.stop()
+    return peaks
+
+def run_pipeline(name, image_paths, measure_memory=True):
+    """Run one pipeline over the images and return its per-image records and summary.
+
+    Latencies come from a pass with tracemalloc off; peak memory, if measured, from a
+    second pass over the same images.
+    """
+    stages = PIPELINES[name]
+    records = []
+    for image_path in image_paths:
+        start = time.perf_counter()
+        times, value, error = run_stages(stages, image_path)
+        records.append({'image': os.path.basename(image_path), 'stages': times, 'error': error,
+                        'total': time.perf_counter() - start, 'parsed': parses(value)})
+
+    if measure_memory:
+        for record, peak in zip(records, measure_peak_memory(stages, image_paths)):
+            record['peak_memory_bytes'] = peak
+    summary = {
+        'images': len(records),
+        'errors': sum(1 for r in records if r['error']),
+        'parse_success_rate': sum(1 for r in records if r['parsed']) / len(records) if records else 0,
+        'peak_memory_bytes': max((r.get('peak_memory_bytes', 0) for r in records), default=0),
+        'total': summarize([r['total'] for r in records]),
+        'stages': {stage_name: summarize([r['stages'][stage_name] for r in records if stage_name in r['stages']])
+                   for stage_name, _ in stages},
+    }
+    return {'summary': summary, 'images': records}
+
+def compare(report, baseline, max_slowdown):
+    """Return a list of regressions of report against an earlier baseline report."""
+    regressions = []
+    for name, result in report['pipelines'].items():
+        old = baseline['pipelines'].get(name)
+        if not old:
+            continue
+        new_mean = result['summary']['total']['mean_ms']
+        old_mean = old['summary']['total']['mean_ms']
+        if new_mean > old_mean * (1 + max_slowdown):
+            regressions.append(f"{name}: mean latency {old_mean:.1f} ms -> {new_mean:.1f} ms")
+        new_rate = result['summary']['parse_success_rate']
+        old_rate = old['summary']['parse_success_rate']
+        if new_rate < old_rate:
+            regressions.append(f"{name}: parse success {old_rate:.1%} -> {new_rate:.1%}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the OCR pipelines on a fixed image set.")
+    parser.add_argument('--images', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Source_img'),
+                        help="directory of images to run")
+    parser.add_argument('--limit', type=int, help="only use the first N images (sorted by name)")
+    parser.add_argument('--pipelines', nargs='+', choices=sorted(PIPELINES), default=sorted(PIPELINES),
+                        help="pipelines to run (default: all)")
+    parser.add_argument('--report', default='benchmark_report.json', help="where to write the JSON report")
+    parser.add_argument('--baseline', help="earlier report to check for regressions")
+    parser.add_argument('--no-memory', action='store_true',
+                        help="skip the second pass that measures peak memory")
+    parser.add_argument('--max-slowdown', type=float, default=0.1,
+                        help="allowed mean latency increase over the baseline (default 0.1 = 10%%)")
+    args = parser.parse_args()
+
+    filenames = sorted(f for f in os.listdir(args.images) if f.endswith(('.png', '.jpg', '.jpeg')))[:args.limit]
+    image_paths = [os.path.join(args.images, filename) for filename in filenames]
+    report = {
+        'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'python': platform.python_version(),
+        'ocr_engine': OcrEngine.get_engine().name,
+        'image_count': len(image_paths),
+        'pipelines': {},
+    }
+
+    print(f"{'pipeline':<18} {'mean ms':>9} {'p95 ms':>9} {'peak MB':>8} {'parsed':>7}")
+    for name in args.pipelines:
+        result = run_pipeline(name, image_paths, measure_memory=not args.no_memory)
+        report['pipelines'][name] = result
+        summary = result['summary']
+        print(f"{name:<18} {summary['total']['mean_ms']:>9.1f} {summary['total']['p95_ms']:>9.1f} "
+              f"{summary['peak_memory_bytes'] / 1e6:>8.1f} {summary['parse_success_rate']:>7.1%}")
+
+    with open(args.report, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Report written to {args.report}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.max_slowdown)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+import argparse
+import logging
+import os
+import sqlite3
+
+import cv2
+import numpy as np
+from PIL import Image
+
+import IncrementalIngest
+
+# The screenshots share one slide layout and differ only in their text, so a classic
+# dHash cannot separate different questions from JPEG noise (on Source_img a 64x32
+# dHash puts re-encoded copies of a frame as far apart as different questions). The
+# hash used here marks each pixel of a 128x64 thumbnail that is darker than its row
+# neighbourhood, i.e. where the text ink is. Different questions stay at least ~23
+# bits apart, while re-encoded or rescaled copies of a frame differ by under 10.
+HASH_WIDTH = 128
+HASH_HEIGHT = 64
+# A pixel counts as ink when it is this much darker than the mean of its 9-pixel row window
+INK_CONTRAST = 6
+# Frames at most this many bits apart are treated as the same slide
+DEFAULT_THRESHOLD = 14
+
+def ink_hash(image_path, width=HASH_WIDTH, height=HASH_HEIGHT):
+    """Return the perceptual hash of an image as an int of width * height bits."""
+    img = Image.open(image_path)
+    # Let the JPEG decoder skip detail we throw away anyway
+    img.draft('L', (img.width // 4, img.height // 4))
+    pixels = np.asarray(img.convert('L').resize((width, height), Image.BOX), dtype=np.float32)
+    ink = pixels < cv2.blur(pixels, (9, 1)) - INK_CONTRAST
+    return int.from_bytes(np.packbits(ink).tobytes(), 'big')
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+class BKTree:
+    """Burkhard-Keller tree over Hamming distance for finding hashes within a radius."""
+
+    def __init__(self):
+        self.root = None
+
+    def add(self, value, item):
+        node = (value, item, {})
+        if self.root is None:
+            self.root = node
+            return
+        current = self.root
+        while True:
+            distance = hamming(value, current[0])
+            child = current[2].get(distance)
+            if child is None:
+                current[2][distance] = node
+                return
+            current = child
+
+    def find(self, value, radius):
+        """Return the (distance, item) closest to value within radius, or None."""
+        best = None
+        stack = [self.root] if self.root else []
+        while stack:
+            node_value, item, children = stack.pop()
+            distance = hamming(value, node_value)
+            if distance <= radius and (best is None or distance < best[0]):
+                best = (distance, item)
+            # Triangle inequality: only subtrees in [distance - radius, distance + radius] can match
+            for child_distance, child in children.items():
+                if distance - radius <= child_distance <= distance + radius:
+                    stack.append(child)
+        return best
+
+def create_duplicates_table(conn):
+    """Create the table that maps every image to the representative of its cluster."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS ImageDuplicates (
+            filename TEXT PRIMARY KEY,
+            phash TEXT,
+            mtime REAL,
+            size INTEGER,
+            representative TEXT,
+            distance INTEGER
+        )
+    ''')
+    conn.commit()
+
+def cluster_images(conn, directory_path, threshold=DEFAULT_THRESHOLD):
+    """Hash every image, group near-identical frames and record the mapping in ImageDuplicates.
+
+    Images are visited in filename (capture time) order and each joins the closest
+    earlier representative within threshold bits, or becomes a representative itself.
+    Hashes of files whose mtime and size are unchanged are reused from the table.
+    Returns {filename: (representative, distance)}.
+    """
+    create_duplicates_table(conn)
+    known = {row[0]: row[1:] for row in conn.execute('SELECT filename, phash, mtime, size FROM ImageDuplicates')}
+    tree = BKTree()
+    clusters = {}
+    rows = []
+
+    for filename in sorted(os.listdir(directory_path)):
+        if not filename.endswith(IncrementalIngest.IMAGE_EXTENSIONS):
+            continue
+        image_path = os.path.join(directory_path, filename)
+        try:
+            stat = os.stat(image_path)
+        except OSError as e:
+            logging.error(f"Error reading {image_path}, skipping it: {e}")
+            continue
+        cached = known.get(filename)
+        if cached and cached[1] == stat.st_mtime and cached[2] == stat.st_size:
+            value = int(cached[0], 16)
+        else:
+            try:
+                value = ink_hash(image_path)
+            except Exception as e:
+                logging.error(f"Error hashing image {image_path}: {e}")
+                continue
+
+        match = tree.find(value, threshold)
+        if match:
+            distance, representative = match
+        else:
+            distance, representative = 0, filename
+            tree.add(value, filename)
+        clusters[filename] = (representative, distance)
+        rows.append((filename, format(value, 'x'), stat.st_mtime, stat.st_size, representative, distance))
+
+    with conn:
+        conn.execute('DELETE FROM ImageDuplicates')
+        conn.executemany('INSERT INTO ImageDuplicates VALUES (?, ?, ?, ?, ?, ?)', rows)
+    return clusters
+
+def dedup_images(directory_path, db_path, threshold=DEFAULT_THRESHOLD):
+    """Cluster the images and return the set of filenames that duplicate an earlier frame."""
+    conn = sqlite3.connect(db_path)
+    try:
+        clusters = cluster_images(conn, directory_path, threshold)
+    finally:
+        conn.close()
+    duplicates = {filename for filename, (representative, _) in clusters.items() if representative != filename}
+    logging.info(f"{len(clusters)} images, {len(clusters) - len(duplicates)} distinct, {len(duplicates)} duplicates skipped")
+    return duplicates
+
+def main():
+    parser = argparse.ArgumentParser(description="Group near-identical screenshots so only one per slide is OCR'd.")
+    parser.add_argument('directory', help="folder of screenshots")
+    parser.add_argument('db_path', help="SQLite database to record the mapping in")
+    parser.add_argument('--threshold', type=int, default=DEFAULT_THRESHOLD, help="maximum differing hash bits")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    dedup_images(args.directory, args.db_path, args.threshold)
+
+if __name__ == "__main__":
+    main()
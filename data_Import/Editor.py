@@ -1,7 +1,13 @@
 import tkinter as tk
 from tkinter import messagebox, filedialog
 from PIL import Image, ImageTk
-import sqlite3
+import os
+import sys
+
+# DisplayImages and Database live in the project root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import Database
+import DisplayImages
 
 # Function to load a question from the database
 def load_question():
@@ -30,8 +36,7 @@ def load_question():
 
         # Load and display the image
         try:
-            img = Image.open(f"{directory}/{image_filename}")
-            img = img.resize((500, 350))  # Enlarge image display
+            img = DisplayImages.get_display_image(f"{directory}/{image_filename}", DisplayImages.IMPORT_EDITOR_SIZE)
             img_tk = ImageTk.PhotoImage(img)
             image_label.configure(image=img_tk)
             image_label.image = img_tk
@@ -39,29 +44,18 @@ def load_question():
             messagebox.showerror("Error", f"Could not load image: {e}")
 
         # Check whether CleanedData exists for this question
-        cursor.execute("SELECT * FROM CleanedData WHERE question_id=?", (current_question_id,))
-        cleaned_data = cursor.fetchone()
+        cleaned_data = repository.get_cleaned_data(current_question_id)
         if cleaned_data:
-            # cleaned_data layout (if table was created/upgraded as expected):
-            # index 0: id, 1: question_id, 2: cleaned_question,
-            # 3: answer1, 4: answer2, 5: answer3, 6: answer4, 7: correct_answers
-            cleaned_question = cleaned_data[2]
+            cleaned_question, answers = cleaned_data
             if cleaned_question:
                 question_textbox.delete("1.0", tk.END)
                 question_textbox.insert(tk.END, cleaned_question)
-            answer1.set(cleaned_data[3] if cleaned_data[3] is not None else "")
-            answer2.set(cleaned_data[4] if cleaned_data[4] is not None else "")
-            answer3.set(cleaned_data[5] if cleaned_data[5] is not None else "")
-            answer4.set(cleaned_data[6] if cleaned_data[6] is not None else "")
-            # Check if there is a "correct_answers" column (index 7)
-            if len(cleaned_data) > 7 and cleaned_data[7]:
-                correct_list = cleaned_data[7].split(',')
-            else:
-                correct_list = []
-            checkbox1_var.set(answer1.get() in correct_list)
-            checkbox2_var.set(answer2.get() in correct_list)
-            checkbox3_var.set(answer3.get() in correct_list)
-            checkbox4_var.set(answer4.get() in correct_list)
+            # Answers come back in position order with their correct flags
+            for (answer_text, is_correct), answer_var, checkbox_var in zip(
+                    answers, (answer1, answer2, answer3, answer4),
+                    (checkbox1_var, checkbox2_var, checkbox3_var, checkbox4_var)):
+                answer_var.set(answer_text)
+                checkbox_var.set(is_correct)
     else:
         messagebox.showinfo("Info", "No more questions to load.")
 
@@ -69,30 +63,17 @@ def load_question():
 def save_answers():
     # Get the current (cleaned-up) question text from the editable text widget
     cleaned_question = question_textbox.get("1.0", tk.END).strip()
-    correct = []
-    answers = [answer1.get(), answer2.get(), answer3.get(), answer4.get()]
-
-    # Check which answer(s) is marked as correct
-    if checkbox1_var.get():
-        correct.append(answer1.get())
-    if checkbox2_var.get():
-        correct.append(answer2.get())
-    if checkbox3_var.get():
-        correct.append(answer3.get())
-    if checkbox4_var.get():
-        correct.append(answer4.get())
-
-    if not correct:
+    # (answer text, is correct) for each answer in order
+    answers = [(answer1.get(), checkbox1_var.get()), (answer2.get(), checkbox2_var.get()),
+               (answer3.get(), checkbox3_var.get()), (answer4.get(), checkbox4_var.get())]
+
+    if not any(is_correct for _, is_correct in answers):
         messagebox.showwarning("Warning", "Please mark at least one correct answer!")
         return
 
-    # Save the cleaned question along with the answers and correct answers
-    cursor.execute("""
-        INSERT OR REPLACE INTO CleanedData 
-            (question_id, cleaned_question, answer1, answer2, answer3, answer4, correct_answers)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-    """, (current_question_id, cleaned_question, answers[0], answers[1], answers[2], answers[3], ','.join(correct)))
-    conn.commit()
+    # Save the cleaned question along with the answers and their correct flags
+    with repository.conn:
+        repository.save_cleaned_question(current_question_id, cleaned_question, answers)
 
     messagebox.showinfo("Success", "Question and answers saved successfully!")
 
@@ -115,23 +96,9 @@ def previous_question():
 db_path = filedialog.askopenfilename(title="Select the database file")
 directory = filedialog.askdirectory(title="Select the directory containing images")
 
-conn = sqlite3.connect(db_path)
-cursor = conn.cursor()
-
-# Create the CleanedData table if it doesn't already exist.
-cursor.execute("""
-    CREATE TABLE IF NOT EXISTS CleanedData (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        question_id INTEGER UNIQUE,
-        cleaned_question TEXT,
-        answer1 TEXT,
-        answer2 TEXT,
-        answer3 TEXT,
-        answer4 TEXT,
-        correct_answers TEXT
-    )
-""")
-conn.commit()
+# The repository upgrades the database to the current schema (see Migrations.py) when it connects
+repository = Database.get_repository(db_path)
+cursor = repository.conn.cursor()
 
 # Initialize the GUI
 root = tk.Tk()
@@ -1,5 +1,12 @@
+import hashlib
+import os
 import sqlite3
 import re
+import sys
+
+# Migrations lives in the project root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import Migrations
 
 def parse_text_column(text):
     """Parse the text into question number, question text, and four answers."""
@@ -36,60 +43,97 @@ def parse_text_column(text):
     return question_number, question_text, *answers
 
 def create_cleaned_data_table(db_path):
-    """Create a table for cleaned data if it doesn't already exist."""
+    """Create the CleanedData table if it doesn't already exist and upgrade it to the current schema."""
     conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    
-    # Create the CleanedData table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS CleanedData (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            question_id INTEGER UNIQUE,
-            question_number TEXT,
-            cleaned_question TEXT,
-            answer1 TEXT,
-            answer2 TEXT,
-            answer3 TEXT,
-            answer4 TEXT
-        )
-    """)
-    conn.commit()
+    Migrations.migrate(conn)
     conn.close()
 
-def process_imagetext_table(db_path):
-    """Process the ImageText table and extract questions and answers."""
+def source_hash(text):
+    """Return the hash stored with a CleanedData row of the ImageText text it was parsed from."""
+    return hashlib.sha1((text or "").encode("utf-8")).hexdigest()
+
+def parser_name(parse_function):
+    """Return the name ParseFailures records a parse function's failures under, e.g. 'Formatter.parse_text_column'.
+
+    Taken from the source file rather than __module__, which is '__main__' when the
+    script is run directly.
+    """
+    module = os.path.splitext(os.path.basename(parse_function.__code__.co_filename))[0]
+    return f"{module}.{parse_function.__qualname__}"
+
+def upsert_cleaned_data(conn, rows):
+    """Insert or update parsed (question_id, question_number, question, answer1-4, source_hash) rows.
+
+    Existing rows are updated in place rather than replaced, and rows marked fixed in the
+    editor are never touched. CleanedData needs the fixed and source_hash columns.
+    """
+    conn.executemany("""
+        INSERT INTO CleanedData
+        (question_id, question_number, cleaned_question, answer1, answer2, answer3, answer4, source_hash)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(question_id) DO UPDATE SET
+            question_number = excluded.question_number,
+            cleaned_question = excluded.cleaned_question,
+            answer1 = excluded.answer1,
+            answer2 = excluded.answer2,
+            answer3 = excluded.answer3,
+            answer4 = excluded.answer4,
+            source_hash = excluded.source_hash
+        WHERE fixed IS NOT 1
+    """, rows)
+
+def process_imagetext_table(db_path, parse_function=parse_text_column, batch_size=500):
+    """Parse new or changed ImageText rows into CleanedData.
+
+    ImageText is read in pages of batch_size rows, so memory use does not grow with
+    the table, and all writes go into one transaction. Rows that already have
+    CleanedData parsed from the same text, and rows marked fixed in the editor, are
+    skipped. So are rows this parser already failed on with the same text, which are
+    recorded in ParseFailures. Returns (parsed, skipped as unchanged, failed to parse).
+    """
     conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    
-    # Fetch all rows from the ImageText table
-    cursor.execute("SELECT id, text FROM ImageText")
-    rows = cursor.fetchall()
-    
-    # Prepare to insert parsed data
-    cleaned_data = []
-    
-    for row in rows:
-        row_id, text = row
-        try:
-            # Parse the text column
-            question_number, question_text, answer1, answer2, answer3, answer4 = parse_text_column(text)
-            cleaned_data.append((row_id, question_number, question_text, answer1, answer2, answer3, answer4))
-        except Exception as e:
-            print(f"Skipping row {row_id} due to error: {e}")
-    
-    # Insert cleaned data into the CleanedData table
-    for data in cleaned_data:
-        try:
-            cursor.execute("""
-                INSERT OR REPLACE INTO CleanedData 
-                (question_id, question_number, cleaned_question, answer1, answer2, answer3, answer4)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            """, data)
-        except sqlite3.IntegrityError as e:
-            print(f"Failed to insert data for row ID {data[0]}: {e}")
-    
-    conn.commit()
-    conn.close()
+    Migrations.migrate(conn)
+    parser = parser_name(parse_function)
+    parsed = unchanged = failed = 0
+    last_id = -1
+    try:
+        with conn:
+            while True:
+                # Read a whole page before writing, so the upserts never run under an open cursor
+                rows = conn.execute("""
+                    SELECT ImageText.id, ImageText.text, CleanedData.source_hash, ParseFailures.source_hash
+                    FROM ImageText
+                    LEFT JOIN CleanedData ON CleanedData.question_id = ImageText.id
+                    LEFT JOIN ParseFailures ON ParseFailures.question_id = ImageText.id AND ParseFailures.parser = ?
+                    WHERE ImageText.id > ? AND CleanedData.fixed IS NOT 1
+                    ORDER BY ImageText.id LIMIT ?
+                """, (parser, last_id, batch_size)).fetchall()
+                if not rows:
+                    break
+                last_id = rows[-1][0]
+
+                cleaned_data = []
+                failures = []
+                for row_id, text, old_hash, failed_hash in rows:
+                    text_hash = source_hash(text)
+                    if text_hash in (old_hash, failed_hash):
+                        unchanged += 1
+                        continue
+                    try:
+                        cleaned_data.append((row_id, *parse_function(text), text_hash))
+                    except Exception as e:
+                        failed += 1
+                        failures.append((row_id, parser, text_hash, str(e)))
+                        print(f"Skipping row {row_id} due to error: {e}")
+                upsert_cleaned_data(conn, cleaned_data)
+                conn.executemany("DELETE FROM ParseFailures WHERE question_id = ? AND parser = ?",
+                                 [(row[0], parser) for row in cleaned_data])
+                conn.executemany("INSERT OR REPLACE INTO ParseFailures (question_id, parser, source_hash, error) "
+                                 "VALUES (?, ?, ?, ?)", failures)
+                parsed += len(cleaned_data)
+    finally:
+        conn.close()
+    return parsed, unchanged, failed
 
 def main():
     # Prompt the user for the database path
@@ -99,8 +143,9 @@ def main():
     create_cleaned_data_table(db_path)
     
     # Process the ImageText table to clean and extract data
-    process_imagetext_table(db_path)
-    print(f"Processing complete. Cleaned data has been saved to the database at {db_path}.")
+    parsed, unchanged, failed = process_imagetext_table(db_path)
+    print(f"Processing complete: {parsed} rows parsed, {unchanged} unchanged, {failed} failed. "
+          f"Cleaned data has been saved to the database at {db_path}.")
 
 if __name__ == "__main__":
     main()
@@ -1,6 +1,7 @@
-import sqlite3
 import re
 
+import Formatter
+
 def parse_text_column(text):
     """Parse the text into question number, question text, and four answers."""
     lines = text.split('\n')  # Split the text into lines
@@ -43,60 +44,12 @@ def parse_text_column(text):
     return question_number, question_text, *answers
 
 def create_cleaned_data_table(db_path):
-    """Create a table for cleaned data if it doesn't already exist."""
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    
-    # Create the CleanedData table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS CleanedData (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            question_id INTEGER UNIQUE,
-            question_number TEXT,
-            cleaned_question TEXT,
-            answer1 TEXT,
-            answer2 TEXT,
-            answer3 TEXT,
-            answer4 TEXT
-        )
-    """)
-    conn.commit()
-    conn.close()
+    """Create the CleanedData table if it doesn't already exist and upgrade it to the current schema."""
+    Formatter.create_cleaned_data_table(db_path)
 
 def process_imagetext_table(db_path):
-    """Process the ImageText table and extract questions and answers."""
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    
-    # Fetch all rows from the ImageText table
-    cursor.execute("SELECT id, text FROM ImageText")
-    rows = cursor.fetchall()
-    
-    # Prepare to insert parsed data
-    cleaned_data = []
-    
-    for row in rows:
-        row_id, text = row
-        try:
-            # Parse the text column
-            question_number, question_text, answer1, answer2, answer3, answer4 = parse_text_column(text)
-            cleaned_data.append((row_id, question_number, question_text, answer1, answer2, answer3, answer4))
-        except Exception as e:
-            print(f"Skipping row {row_id} due to error: {e}")
-    
-    # Insert cleaned data into the CleanedData table
-    for data in cleaned_data:
-        try:
-            cursor.execute("""
-                INSERT OR REPLACE INTO CleanedData 
-                (question_id, question_number, cleaned_question, answer1, answer2, answer3, answer4)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            """, data)
-        except sqlite3.IntegrityError as e:
-            print(f"Failed to insert data for row ID {data[0]}: {e}")
-    
-    conn.commit()
-    conn.close()
+    """Parse new or changed ImageText rows into CleanedData with this module's parser (see Formatter)."""
+    return Formatter.process_imagetext_table(db_path, parse_function=parse_text_column)
 
 def main():
     # Prompt the user for the database path
@@ -106,8 +59,9 @@ def main():
     create_cleaned_data_table(db_path)
     
     # Process the ImageText table to clean and extract data
-    process_imagetext_table(db_path)
-    print(f"Processing complete. Cleaned data has been saved to the database at {db_path}.")
+    parsed, unchanged, failed = process_imagetext_table(db_path)
+    print(f"Processing complete: {parsed} rows parsed, {unchanged} unchanged, {failed} failed. "
+          f"Cleaned data has been saved to the database at {db_path}.")
 
 if __name__ == "__main__":
     main()
@@ -4,6 +4,9 @@ import os
 import sqlite3
 import logging
 
+import IncrementalIngest
+import OcrEngine
+
 # Configure logging
 logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
 
@@ -13,7 +16,7 @@ pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tessera
 def extract_text(image_path):
     try:
         img = Image.open(image_path)
-        text = pytesseract.image_to_string(img)
+        text = OcrEngine.image_to_string(img)
         return text
     except Exception as e:
         logging.error(f"Error extracting text from {image_path}: {e}")
@@ -42,6 +45,12 @@ def process_images(directory_path, db_path):
 # Define the directory containing images and the database path
 directory_path = "C:\\Users\\nico_\\Dropbox\\Morne_App\\Source_img"
 db_path = 'path_to_your_database.db'
+# Only OCR images that are new or changed since the last run
+incremental = True
 
 # Process the images and insert text into the database
-process_images(directory_path, db_path)
+if __name__ == "__main__":
+    if incremental:
+        IncrementalIngest.process_images_incremental(directory_path, db_path, extract_text)
+    else:
+        process_images(directory_path, db_path)
@@ -5,37 +5,57 @@ import os
 import sqlite3
 import logging
 
+import IncrementalIngest
+import OcrEngine
+import PreprocessCache
+
 # Configure logging
 logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
 
 # Configure Tesseract executable path
 pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
 
+# Preprocessing parameters, also used as part of the preprocess cache key
+PREPROCESS_PARAMS = {'filter': 'SHARPEN', 'contrast': 2}
+
 def preprocess_image(image_path):
     try:
         img = Image.open(image_path)
         # Convert image to grayscale
         img = img.convert('L')
         # Apply sharpening filter
-        img = img.filter(ImageFilter.SHARPEN)
+        img = img.filter(getattr(ImageFilter, PREPROCESS_PARAMS['filter']))
         # Enhance contrast
         enhancer = ImageEnhance.Contrast(img)
-        img = enhancer.enhance(2)
+        img = enhancer.enhance(PREPROCESS_PARAMS['contrast'])
         return img
     except Exception as e:
         logging.error(f"Error preprocessing image {image_path}: {e}")
         return None
 
+def preprocess_image_cached(image_path):
+    """preprocess_image, served from the preprocess cache when this image and parameter set were seen before."""
+    if preprocess_cache is None:
+        return preprocess_image(image_path)
+    return preprocess_cache.get_or_create(image_path, 'ImgTest2', PREPROCESS_PARAMS, preprocess_image)
+
 def extract_text(image):
     try:
         # Configure Tesseract
         custom_config = r'--oem 3 --psm 6 -l eng' #--dpi 300
-        text = pytesseract.image_to_string(image, config=custom_config)
+        text = OcrEngine.image_to_string(image, config=custom_config)
         return text
     except Exception as e:
         logging.error(f"Error extracting text: {e}")
         return ""
 
+def ocr_file(image_path):
+    """Preprocess and OCR one image, returning None if it could not be preprocessed."""
+    preprocessed_image = preprocess_image_cached(image_path)
+    if not preprocessed_image:
+        return None
+    return extract_text(preprocessed_image)
+
 def process_images(directory_path, db_path):
     try:
         conn = sqlite3.connect(db_path)
@@ -61,6 +81,14 @@ def process_images(directory_path, db_path):
 # Define the directory containing images and the database path
 directory_path = "C:\\Users\\nico_\\Dropbox\\Morne_App\\Source_img"
 db_path = 'Question_DB.db'
+# Only OCR images that are new or changed since the last run
+incremental = True
+# Reuse preprocessed images from earlier runs (set to None to disable)
+preprocess_cache = PreprocessCache.PreprocessCache()
 
 # Process the images and insert text into the database
-process_images(directory_path, db_path)
+if __name__ == "__main__":
+    if incremental:
+        IncrementalIngest.process_images_incremental(directory_path, db_path, ocr_file)
+    else:
+        process_images(directory_path, db_path)
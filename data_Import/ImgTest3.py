@@ -5,6 +5,13 @@ import numpy as np
 import os
 import sqlite3
 import logging
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import Dedup
+import IncrementalIngest
+import OcrEngine
+import PreprocessCache
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -12,32 +19,49 @@ logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %
 # Configure Tesseract executable path
 pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
 
+# Preprocessing parameters, also used as part of the preprocess cache key
+PREPROCESS_PARAMS = {'blur_kernel': 5, 'block_size': 11, 'c': 2, 'morph_kernel': 2, 'morph_iterations': 1}
+
 def preprocess_image(image_path):
     try:
+        params = PREPROCESS_PARAMS
         img = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
         # Apply Gaussian blur to reduce noise
-        img = cv2.GaussianBlur(img, (5, 5), 0)
+        img = cv2.GaussianBlur(img, (params['blur_kernel'], params['blur_kernel']), 0)
         # Apply adaptive thresholding to enhance contrast
-        img = cv2.adaptiveThreshold(img, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2)
+        img = cv2.adaptiveThreshold(img, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, params['block_size'], params['c'])
         # Apply dilation and erosion to enhance text clarity
-        kernel = np.ones((2, 2), np.uint8)
-        img = cv2.dilate(img, kernel, iterations=1)
-        img = cv2.erode(img, kernel, iterations=1)
+        kernel = np.ones((params['morph_kernel'], params['morph_kernel']), np.uint8)
+        img = cv2.dilate(img, kernel, iterations=params['morph_iterations'])
+        img = cv2.erode(img, kernel, iterations=params['morph_iterations'])
         return img
     except Exception as e:
         logging.error(f"Error preprocessing image {image_path}: {e}")
         return None
 
+def preprocess_image_cached(image_path):
+    """preprocess_image, served from the preprocess cache when this image and parameter set were seen before."""
+    if preprocess_cache is None:
+        return preprocess_image(image_path)
+    return preprocess_cache.get_or_create(image_path, 'ImgTest3', PREPROCESS_PARAMS, preprocess_image, as_array=True)
+
 def extract_text(image):
     try:
         # Configure Tesseract
         custom_config = r'--oem 3 --psm 6'
-        text = pytesseract.image_to_string(image, config=custom_config)
+        text = OcrEngine.image_to_string(image, config=custom_config)
         return text
     except Exception as e:
         logging.error(f"Error extracting text: {e}")
         return ""
 
+def ocr_file(image_path):
+    """Preprocess and OCR one image, returning None if it could not be preprocessed."""
+    preprocessed_image = preprocess_image_cached(image_path)
+    if preprocessed_image is None:
+        return None
+    return extract_text(preprocessed_image)
+
 def process_images(directory_path, db_path):
     try:
         conn = sqlite3.connect(db_path)
@@ -60,9 +84,108 @@ def process_images(directory_path, db_path):
     except Exception as e:
         logging.error(f"Error processing images: {e}")
 
+def ocr_image(image_path):
+    """Preprocess and OCR one image, returning the text and the time spent in each stage."""
+    start = time.perf_counter()
+    preprocessed_image = preprocess_image_cached(image_path)
+    preprocess_time = time.perf_counter() - start
+    if preprocessed_image is None:
+        return None, preprocess_time, 0.0
+
+    start = time.perf_counter()
+    text = extract_text(preprocessed_image)
+    ocr_time = time.perf_counter() - start
+    return text, preprocess_time, ocr_time
+
+def insert_batch(conn, batch, incremental=False):
+    """Write a batch of (filename, text, content_hash, mtime, size) rows in a single transaction."""
+    with conn:
+        if incremental:
+            for row in batch:
+                IncrementalIngest.upsert_image_text(conn, *row)
+        else:
+            conn.executemany('''INSERT INTO ImageText (filename, text) VALUES (?, ?)''', [row[:2] for row in batch])
+
+def log_throughput(stage_times, image_count, wall_time, workers):
+    """Log the total time and images per second of each stage (worker stages are summed over all workers)."""
+    logging.info(f"Processed {image_count} images in {wall_time:.2f}s with {workers} workers "
+                 f"({image_count / wall_time if wall_time else 0:.2f} images/s overall)")
+    for stage, seconds in stage_times.items():
+        rate = image_count / seconds if seconds else 0
+        logging.info(f"  {stage}: {seconds:.2f}s total, {rate:.2f} images/s")
+
+def process_images_parallel(directory_path, db_path, workers=None, batch_size=50, incremental=False, skip=()):
+    """Preprocess and OCR images in a pool of worker processes and insert the results in batches.
+
+    Rows are inserted by this process only, in filename order, so the output is the
+    same no matter how many workers are used. With incremental=True only new or
+    changed images are OCR'd and their rows are upserted. Filenames in skip are not processed.
+    """
+    workers = workers or os.cpu_count()
+    stage_times = {'scan': 0.0, 'preprocess': 0.0, 'ocr': 0.0, 'insert': 0.0}
+    image_count = 0
+
+    try:
+        conn = sqlite3.connect(db_path)
+        start = time.perf_counter()
+        if incremental:
+            IncrementalIngest.create_image_files_table(conn)
+            jobs = IncrementalIngest.find_changed_images(conn, directory_path, skip)
+        else:
+            conn.execute('''CREATE TABLE IF NOT EXISTS ImageText (id INTEGER PRIMARY KEY, filename TEXT, text TEXT)''')
+            conn.commit()
+            filenames = sorted(f for f in os.listdir(directory_path) if f.endswith(('.png', '.jpg', '.jpeg')) and f not in skip)
+            jobs = [(filename, os.path.join(directory_path, filename), None, None, None) for filename in filenames]
+        stage_times['scan'] = time.perf_counter() - start
+
+        batch = []
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # map() yields results in submission order, which keeps the inserts deterministic
+            image_paths = [job[1] for job in jobs]
+            results = executor.map(ocr_image, image_paths, chunksize=max(1, len(image_paths) // (workers * 8)))
+            for (filename, _, content_hash, mtime, size), (text, preprocess_time, ocr_time) in zip(jobs, results):
+                logging.info(f"Processed image: {filename}")
+                stage_times['preprocess'] += preprocess_time
+                stage_times['ocr'] += ocr_time
+                if text is None:
+                    continue
+                batch.append((filename, text, content_hash, mtime, size))
+                image_count += 1
+                if len(batch) >= batch_size:
+                    insert_start = time.perf_counter()
+                    insert_batch(conn, batch, incremental)
+                    stage_times['insert'] += time.perf_counter() - insert_start
+                    batch = []
+
+        if batch:
+            insert_start = time.perf_counter()
+            insert_batch(conn, batch, incremental)
+            stage_times['insert'] += time.perf_counter() - insert_start
+
+        conn.close()
+        log_throughput(stage_times, image_count, time.perf_counter() - start, workers)
+    except Exception as e:
+        logging.error(f"Error processing images: {e}")
+
 # Define the directory containing images and the database path
 directory_path = "C:\\Users\\nico_\\Dropbox\\Morne_App\\Source_img"
 db_path = 'path_to_your_database.db'
+# Number of worker processes for preprocessing and OCR (1 runs everything in this process)
+workers = os.cpu_count()
+# Only OCR images that are new or changed since the last run
+incremental = True
+# Only OCR one frame of each group of near-identical screenshots
+dedup = True
+# Reuse preprocessed images from earlier runs (set to None to disable)
+preprocess_cache = PreprocessCache.PreprocessCache()
 
-# Process the images and insert text into the database
-process_images(directory_path, db_path)
+# Process the images and insert text into the database. The guard keeps the
+# worker processes from re-running the import when they load this module.
+if __name__ == "__main__":
+    skip = Dedup.dedup_images(directory_path, db_path) if dedup else set()
+    if workers > 1:
+        process_images_parallel(directory_path, db_path, workers, incremental=incremental, skip=skip)
+    elif incremental:
+        IncrementalIngest.process_images_incremental(directory_path, db_path, ocr_file, skip)
+    else:
+        process_images(directory_path, db_path)
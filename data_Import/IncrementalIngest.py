@@ -0,0 +1,136 @@
+import hashlib
+import os
+import sqlite3
+import logging
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+def file_hash(image_path):
+    """Return the SHA-256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(image_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def create_image_files_table(conn):
+    """Create the tables used to track which images have already been OCR'd."""
+    conn.execute('''CREATE TABLE IF NOT EXISTS ImageText (id INTEGER PRIMARY KEY, filename TEXT, text TEXT)''')
+    # One row per source image: the ImageText row it produced and the file state it was made from
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS ImageFiles (
+            filename TEXT PRIMARY KEY,
+            image_id INTEGER,
+            content_hash TEXT,
+            mtime REAL,
+            size INTEGER
+        )
+    ''')
+    conn.commit()
+
+def record_image_file(conn, filename, image_id, content_hash, mtime, size):
+    """Insert or update the tracking row for an image."""
+    conn.execute('''
+        INSERT INTO ImageFiles (filename, image_id, content_hash, mtime, size)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(filename) DO UPDATE SET
+            image_id = excluded.image_id,
+            content_hash = excluded.content_hash,
+            mtime = excluded.mtime,
+            size = excluded.size
+    ''', (filename, image_id, content_hash, mtime, size))
+
+def load_tracking(conn):
+    """Return the ImageFiles rows by filename and the first ImageText id of every filename."""
+    known = {row[0]: row[1:] for row in conn.execute('SELECT filename, image_id, content_hash, mtime, size FROM ImageFiles')}
+    legacy = dict(conn.execute('SELECT filename, MIN(id) FROM ImageText GROUP BY filename'))
+    return known, legacy
+
+def classify_image(filename, image_path, known, legacy):
+    """Decide what an image needs, returning ('skip', None), ('record', row) or ('ocr', job).
+
+    Files whose mtime and size match the tracking row are skipped without being read.
+    Files that were touched but still hash the same, and images that already have an
+    ImageText row from before tracking existed, only need their tracking row written:
+    row is (filename, image_id, content_hash, mtime, size). Everything else needs OCR:
+    job is (filename, image_path, content_hash, mtime, size).
+    """
+    stat = os.stat(image_path)
+    tracked = known.get(filename)
+    if tracked and tracked[2] == stat.st_mtime and tracked[3] == stat.st_size:
+        return 'skip', None
+
+    content_hash = file_hash(image_path)
+    if tracked and tracked[1] == content_hash:
+        return 'record', (filename, tracked[0], content_hash, stat.st_mtime, stat.st_size)
+    if not tracked and legacy.get(filename) is not None:
+        return 'record', (filename, legacy[filename], content_hash, stat.st_mtime, stat.st_size)
+    return 'ocr', (filename, image_path, content_hash, stat.st_mtime, stat.st_size)
+
+def find_changed_images(conn, directory_path, skip=()):
+    """Return (filename, image_path, content_hash, mtime, size) for every image that needs OCR.
+
+    Filenames in skip (e.g. duplicates found by Dedup) are ignored. Tracking rows of
+    unchanged images that only needed a refresh are written as a side effect.
+    """
+    known, legacy = load_tracking(conn)
+    changed = []
+
+    for filename in sorted(os.listdir(directory_path)):
+        if not filename.endswith(IMAGE_EXTENSIONS) or filename in skip:
+            continue
+        image_path = os.path.join(directory_path, filename)
+        try:
+            action, row = classify_image(filename, image_path, known, legacy)
+        except OSError as e:
+            logging.error(f"Error reading {image_path}, skipping it: {e}")
+            continue
+        if action == 'record':
+            record_image_file(conn, *row)
+        elif action == 'ocr':
+            changed.append(row)
+
+    conn.commit()
+    return changed
+
+def upsert_image_text(conn, filename, text, content_hash, mtime, size):
+    """Store the OCR text for an image, replacing the text of its existing row if it has one.
+
+    Empty text counts as a failed OCR: the row is kept, but the file's hash, mtime and
+    size are not recorded, so the next run OCRs the image again.
+    """
+    if not (text or '').strip():
+        content_hash = mtime = size = None
+    row = conn.execute('SELECT image_id FROM ImageFiles WHERE filename = ?', (filename,)).fetchone()
+    if row and row[0] is not None:
+        image_id = row[0]
+        conn.execute('UPDATE ImageText SET text = ? WHERE id = ?', (text, image_id))
+    else:
+        image_id = conn.execute('INSERT INTO ImageText (filename, text) VALUES (?, ?)', (filename, text)).lastrowid
+    record_image_file(conn, filename, image_id, content_hash, mtime, size)
+    return image_id
+
+def process_images_incremental(directory_path, db_path, ocr_function, skip=()):
+    """OCR only new or changed images and upsert their text into ImageText.
+
+    ocr_function takes an image path and returns the extracted text, or None if the
+    image could not be processed. Filenames in skip are not processed.
+    """
+    try:
+        conn = sqlite3.connect(db_path)
+        create_image_files_table(conn)
+
+        changed = find_changed_images(conn, directory_path, skip)
+        logging.info(f"{len(changed)} new or changed images to process")
+
+        for filename, image_path, content_hash, mtime, size in changed:
+            logging.info(f"Processing image: {image_path}")
+            text = ocr_function(image_path)
+            if text is None:
+                continue
+            upsert_image_text(conn, filename, text, content_hash, mtime, size)
+            conn.commit()
+
+        conn.close()
+    except Exception as e:
+        logging.error(f"Error processing images: {e}")
@@ -5,6 +5,14 @@ import numpy as np
 import os
 import sqlite3
 import logging
+import sys
+
+import Formatter
+import OcrEngine
+
+# Migrations lives in the project root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import Migrations
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -15,44 +23,50 @@ pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tessera
 def extract_text(image_path):
     try:
         img = Image.open(image_path)
-        text = pytesseract.image_to_string(img)
+        text = OcrEngine.image_to_string(img)
         return text
     except Exception as e:
         logging.error(f"Error extracting text from {image_path}: {e}")
         return ""
 
-def detect_colored_boxes(image_path):
+# Colour label of every OpenCV hue (0-179) for the blue, green and red boxes
+BLUE, GREEN, RED = 1, 2, 3
+HUE_LABELS = np.zeros(256, np.uint8)
+HUE_LABELS[100:141] = BLUE
+HUE_LABELS[35:86] = GREEN
+HUE_LABELS[0:11] = RED
+HUE_LABELS[160:181] = RED
+# Pixels also need at least this saturation and value to count as coloured
+MIN_SATURATION_VALUE = 100
+# Segment colours on a frame shrunk by this factor; boxes are mapped back to full resolution
+SEGMENT_SCALE = 0.5
+
+def detect_colored_boxes(image_path, scale=SEGMENT_SCALE):
     try:
         img = cv2.imread(image_path)
-        hsv_img = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
-
-        # Define color ranges for blue, green, and red boxes
-        blue_lower = np.array([100, 100, 100])
-        blue_upper = np.array([140, 255, 255])
-        green_lower = np.array([35, 100, 100])
-        green_upper = np.array([85, 255, 255])
-        red_lower1 = np.array([0, 100, 100])
-        red_upper1 = np.array([10, 255, 255])
-        red_lower2 = np.array([160, 100, 100])
-        red_upper2 = np.array([180, 255, 255])
-
-        # Create masks for blue, green, and red
-        blue_mask = cv2.inRange(hsv_img, blue_lower, blue_upper)
-        green_mask = cv2.inRange(hsv_img, green_lower, green_upper)
-        red_mask1 = cv2.inRange(hsv_img, red_lower1, red_upper1)
-        red_mask2 = cv2.inRange(hsv_img, red_lower2, red_upper2)
-        red_mask = cv2.bitwise_or(red_mask1, red_mask2)
-
-        # Detect contours for each color
-        contours_blue, _ = cv2.findContours(blue_mask, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
-        contours_green, _ = cv2.findContours(green_mask, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
-        contours_red, _ = cv2.findContours(red_mask, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
-
-        return contours_blue, contours_green, contours_red
+        return find_colored_boxes(img, scale)
     except Exception as e:
         logging.error(f"Error detecting colored boxes in {image_path}: {e}")
         return [], [], []
 
+def color_label_map(img, scale=SEGMENT_SCALE):
+    """Return one colour label (0 = none, BLUE, GREEN or RED) per pixel, computed in a single pass."""
+    if scale != 1.0:
+        img = cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    hue, saturation, value = cv2.split(cv2.cvtColor(img, cv2.COLOR_BGR2HSV))
+    coloured = cv2.compare(cv2.min(saturation, value), MIN_SATURATION_VALUE, cv2.CMP_GE)
+    return cv2.bitwise_and(cv2.LUT(hue, HUE_LABELS), coloured)
+
+def find_colored_boxes(img, scale=SEGMENT_SCALE):
+    """Return the outer bounding boxes (x, y, w, h) of the blue, green and red regions of a BGR image."""
+    labels = color_label_map(img, scale)
+    boxes = []
+    for label in (BLUE, GREEN, RED):
+        mask = cv2.compare(labels, label, cv2.CMP_EQ)
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        boxes.append([tuple(round(c / scale) for c in cv2.boundingRect(cnt)) for cnt in contours])
+    return tuple(boxes)
+
 def process_images(directory_path, db_path):
     try:
         conn = sqlite3.connect(db_path)
@@ -66,20 +80,20 @@ def process_images(directory_path, db_path):
                 image_path = os.path.join(directory_path, filename)
                 logging.info(f"Processing image: {image_path}\n")
                 text = extract_text(image_path)
-                contours_blue, contours_green, contours_red = detect_colored_boxes(image_path)
+                rects_blue, rects_green, rects_red = detect_colored_boxes(image_path)
 
                 question = None
                 answers = []
                 correct_answer = None
 
-                if contours_blue:
-                    x, y, w, h = cv2.boundingRect(contours_blue[0])
+                if rects_blue:
+                    x, y, w, h = rects_blue[0]
                     question = text[y:y+h]
 
-                for cnt in contours_green + contours_red:
-                    x, y, w, h = cv2.boundingRect(cnt)
+                for rect in rects_green + rects_red:
+                    x, y, w, h = rect
                     answer_text = text[y:y+h]
-                    if cnt in contours_green:
+                    if rect in rects_green:
                         correct_answer = answer_text
                     answers.append(answer_text)
                 logging.debug(f"answers: {answers}")
@@ -92,9 +106,154 @@ def process_images(directory_path, db_path):
     except Exception as e:
         logging.error(f"Error processing images: {e}")
     
+# Ignore coloured specks smaller than this fraction of the frame
+MIN_BOX_FRACTION = 0.005
+# The A-D letter badge of each answer row is green for the correct answer and red for
+# the wrong ones. On a 2340x1080 frame a badge is about 100x94, 0.37% of the frame.
+MIN_BADGE_FRACTION = 0.001
+# Tesseract config for a cropped box: a single uniform block of text
+REGION_OCR_CONFIG = r'--oem 3 --psm 6'
+
+def box_rects(rects, img_area):
+    """Return the outermost rectangles that are big enough to be question/answer boxes."""
+    rects = [r for r in rects if r[2] * r[3] >= img_area * MIN_BOX_FRACTION]
+    # Drop rectangles nested inside another one (e.g. the inner edge of a box outline)
+    return [r for r in rects if not any(
+        o != r and o[0] <= r[0] and o[1] <= r[1] and o[0] + o[2] >= r[0] + r[2] and o[1] + o[3] >= r[1] + r[3]
+        for o in rects)]
+
+def answer_badges(rects_green, rects_red, question_rect, img_area):
+    """Return the (rect, is_correct) of the answer badges below the question box, top to bottom.
+
+    Badges are roughly square and start within the question box's width, which rules
+    out the red YouTube logo and other coloured specks in the frame.
+    """
+    qx, qy, qw, qh = question_rect
+    badges = []
+    for rects, is_correct in ((rects_green, True), (rects_red, False)):
+        for x, y, w, h in rects:
+            if (w * h >= img_area * MIN_BADGE_FRACTION and 0.5 <= w / h <= 2
+                    and qx <= x < qx + qw and y >= qy + qh):
+                badges.append(((x, y, w, h), is_correct))
+    return sorted(badges, key=lambda badge: badge[0][1])[:4]
+
+def crop_region(img, rect, padding=4):
+    """Return the greyscale pixels inside a box, for OCR."""
+    x, y, w, h = rect
+    crop = img[max(0, y - padding):y + h + padding, max(0, x - padding):x + w + padding]
+    return cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
+
+def extract_regions(image_path):
+    """OCR the question box and answer boxes of a screenshot.
+
+    Returns (question, [(answer, is_correct), ...]) with the answers in reading order,
+    or None if no question box was found. Each answer's text sits in a white box to
+    the right of its coloured badge, so the badges only anchor the rows: the answer is
+    read from the badge's right edge to the question box's right edge.
+    """
+    img = cv2.imread(image_path)
+    if img is None:
+        raise ValueError(f"Could not read image {image_path}")
+    rects_blue, rects_green, rects_red = find_colored_boxes(img)
+    img_area = img.shape[0] * img.shape[1]
+
+    blue_rects = box_rects(rects_blue, img_area)
+    if not blue_rects:
+        return None
+    question_rect = max(blue_rects, key=lambda r: r[2] * r[3])
+
+    question_right = question_rect[0] + question_rect[2]
+    answer_rects = [((x + w, y, question_right - (x + w), h), is_correct)
+                    for (x, y, w, h), is_correct in answer_badges(rects_green, rects_red, question_rect, img_area)]
+
+    # No horizontal padding on the answers, so the badge's letter is not read as part of one
+    crops = [crop_region(img, question_rect)] + [crop_region(img, rect, padding=0) for rect, _ in answer_rects]
+    # One batch per frame: without tesserocr that is one tesseract process rather than five
+    question, *answer_texts = [' '.join(text.split())
+                               for text in OcrEngine.images_to_strings(crops, config=REGION_OCR_CONFIG)]
+    answers = [(text, is_correct) for text, (_, is_correct) in zip(answer_texts, answer_rects)]
+    return question, answers
+
+def create_cleaned_data_table(conn):
+    """Create the ImageText and CleanedData tables and upgrade them to the current schema."""
+    Migrations.migrate(conn)
+
+def save_region_question(conn, filename, question, answers):
+    """Write a region-OCR'd question straight into ImageText and CleanedData.
+
+    Rows already marked fixed in the editor are left alone, and nothing is written
+    unless all four answers were read, so a bad detection never overwrites what
+    Formatter parsed. source_hash is set as Formatter sets it, so Formatter's
+    incremental run treats the row as up to date. Returns the question id, or None if
+    nothing was written.
+    """
+    if len(answers) < 4 or not all(answer for answer, _ in answers):
+        return None
+    answer_texts = [answer for answer, _ in answers]
+    correct = '|'.join(answer for answer, is_correct in answers if is_correct)
+
+    row = conn.execute("SELECT id, text FROM ImageText WHERE filename = ? ORDER BY id LIMIT 1", (filename,)).fetchone()
+    if row is None:
+        raw_text = '\n'.join([question] + answer_texts)
+        question_id = conn.execute("INSERT INTO ImageText (filename, text) VALUES (?, ?)", (filename, raw_text)).lastrowid
+    else:
+        question_id, raw_text = row
+
+    conn.execute("""
+        INSERT INTO CleanedData (question_id, cleaned_question, answer1, answer2, answer3, answer4, correct, source_hash)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(question_id) DO UPDATE SET
+            cleaned_question = excluded.cleaned_question,
+            answer1 = excluded.answer1,
+            answer2 = excluded.answer2,
+            answer3 = excluded.answer3,
+            answer4 = excluded.answer4,
+            correct = excluded.correct,
+            source_hash = excluded.source_hash
+        WHERE fixed IS NOT 1
+    """, (question_id, question, *answer_texts, correct, Formatter.source_hash(raw_text)))
+    return question_id
+
+def process_images_regions(directory_path, db_path):
+    """OCR only the detected question/answer boxes of each image and fill CleanedData directly."""
+    try:
+        conn = sqlite3.connect(db_path)
+        create_cleaned_data_table(conn)
+
+        for filename in sorted(os.listdir(directory_path)):
+            if filename.endswith(('.png', '.jpg', '.jpeg')):
+                image_path = os.path.join(directory_path, filename)
+                logging.info(f"Processing image: {image_path}")
+                try:
+                    result = extract_regions(image_path)
+                except Exception as e:
+                    logging.error(f"Error extracting regions from {image_path}: {e}")
+                    continue
+                if result is None:
+                    logging.warning(f"No question box found in {image_path}")
+                    continue
+                question, answers = result
+                logging.debug(f"question: {question} answers: {answers}")
+                if save_region_question(conn, filename, question, answers) is None:
+                    logging.warning(f"Only {sum(1 for answer, _ in answers if answer)} answers read from "
+                                    f"{image_path}; not saved")
+                    continue
+                conn.commit()
+
+        conn.close()
+    except Exception as e:
+        logging.error(f"Error processing images: {e}")
+
 # Define the directory containing images and the database path
 directory_path = "C:\\Users\\nico_\\Dropbox\\Morne_App\\Source_img"
 db_path = 'path_to_your_database.db'
+# OCR only the detected boxes and fill CleanedData instead of OCRing the whole frame
+region_ocr = True
 
 # Process the images and insert text into the database
-process_images(directory_path, db_path)
+if __name__ == "__main__":
+    if region_ocr:
+        process_images_regions(directory_path, db_path)
+    else:
+        process_images(directory_path, db_path)
+
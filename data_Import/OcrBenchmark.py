@@ -0,0 +1,93 @@
+import math
+import os
+import statistics
+import time
+
+import pytesseract
+from PIL import Image
+
+import OcrEngine
+
+# Configure Tesseract executable path
+pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
+
+def load_images(directory_path, limit=None):
+    """Decode the images up front so only OCR time is measured."""
+    filenames = sorted(f for f in os.listdir(directory_path) if f.endswith(('.png', '.jpg', '.jpeg')))[:limit]
+    images = []
+    for filename in filenames:
+        img = Image.open(os.path.join(directory_path, filename))
+        img.load()
+        images.append(img)
+    return images
+
+def benchmark_engine(engine, images):
+    """Return the OCR text and the seconds spent on each image."""
+    texts, timings = [], []
+    for img in images:
+        start = time.perf_counter()
+        texts.append(engine.image_to_string(img))
+        timings.append(time.perf_counter() - start)
+    return texts, timings
+
+def benchmark_batches(engine, images, batch_size):
+    """Return the OCR text and, for each image, its share of the time of the batch it was OCR'd in."""
+    texts, timings = [], []
+    for i in range(0, len(images), batch_size):
+        batch = images[i:i + batch_size]
+        start = time.perf_counter()
+        texts.extend(engine.images_to_strings(batch))
+        timings.extend([(time.perf_counter() - start) / len(batch)] * len(batch))
+    return texts, timings
+
+def print_same_text(baseline_texts, texts):
+    same = sum(1 for a, b in zip(baseline_texts, texts) if a.strip() == b.strip())
+    print(f"Identical text for {same}/{len(texts)} images")
+
+def print_results(name, timings, baseline_total=None):
+    """Print a summary line of per-image latency for one engine."""
+    total = sum(timings)
+    ordered = sorted(timings)
+    # Nearest-rank percentile: the smallest timing at least 95% of the timings are <= to
+    p95 = ordered[max(0, math.ceil(len(ordered) * 0.95) - 1)]
+    speedup = f"{baseline_total / total:.2f}x" if baseline_total else "1.00x"
+    print(f"{name:<12} {len(timings):>6} {total:>9.2f} {statistics.mean(timings) * 1000:>10.1f} "
+          f"{statistics.median(timings) * 1000:>10.1f} {p95 * 1000:>10.1f} {speedup:>8}")
+
+def main(directory_path, config='', limit=None, batch_size=10):
+    images = load_images(directory_path, limit)
+    if not images:
+        print(f"No images found in {directory_path}")
+        return
+
+    print(f"{'engine':<12} {'images':>6} {'total s':>9} {'mean ms':>10} {'median ms':>10} {'p95 ms':>10} {'speedup':>8}")
+    baseline = OcrEngine.PytesseractEngine(config)
+    baseline_texts, baseline_timings = benchmark_engine(baseline, images)
+    print_results(baseline.name, baseline_timings)
+
+    # The same engine, but one tesseract process per batch_size images
+    texts, timings = benchmark_batches(baseline, images, batch_size)
+    print_results(f"batched x{batch_size}", timings, sum(baseline_timings))
+    print_same_text(baseline_texts, texts)
+
+    if OcrEngine.tesserocr is None:
+        print("tesserocr is not installed, skipping the persistent engine")
+        return
+
+    engine = OcrEngine.TesserocrEngine(config)
+    try:
+        texts, timings = benchmark_engine(engine, images)
+    finally:
+        engine.close()
+    print_results(engine.name, timings, sum(baseline_timings))
+    print_same_text(baseline_texts, texts)
+
+# Define the directory containing images, the Tesseract config, how many images to use
+# and how many go into one tesseract run on the batched pytesseract path
+directory_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Source_img')
+config = r'--oem 3 --psm 6'
+limit = 50
+batch_size = 10
+
+if __name__ == "__main__":
+    main(directory_path, config, limit, batch_size)
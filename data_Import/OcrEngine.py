@@ -0,0 +1,145 @@
+import atexit
+import logging
+import os
+import shlex
+import subprocess
+import tempfile
+import threading
+
+import pytesseract
+from PIL import Image
+
+# tesserocr binds the Tesseract C API directly. It is optional: without it every
+# call falls back to pytesseract, which starts a tesseract process per image, so
+# callers with several images should use images_to_strings(), which then runs one
+# tesseract process over all of them.
+try:
+    import tesserocr
+except ImportError:
+    tesserocr = None
+
+# Which engine get_engine() returns: 'auto' (tesserocr if installed), 'tesserocr' or 'pytesseract'
+ENGINE = 'auto'
+
+def parse_config(config):
+    """Return (lang, psm, oem) from a tesseract command line config such as '--oem 3 --psm 6 -l eng'."""
+    lang, psm, oem = 'eng', 3, 3
+    args = shlex.split(config)
+    for i, arg in enumerate(args[:-1]):
+        if arg == '-l':
+            lang = args[i + 1]
+        elif arg == '--psm':
+            psm = int(args[i + 1])
+        elif arg == '--oem':
+            oem = int(args[i + 1])
+    return lang, psm, oem
+
+def default_tessdata_path():
+    """Return the tessdata folder next to the configured tesseract executable, if there is one."""
+    path = os.path.join(os.path.dirname(pytesseract.pytesseract.tesseract_cmd), 'tessdata')
+    return path if os.path.isdir(path) else None
+
+def as_pil(image):
+    # OpenCV preprocessing hands us numpy arrays rather than PIL images
+    return image if isinstance(image, Image.Image) else Image.fromarray(image)
+
+class PytesseractEngine:
+    """Runs a new tesseract process, passing the image through a temp file, for every call.
+
+    images_to_strings() instead writes all its images and a list of their paths, and
+    runs one tesseract process over the list, which pays the process start and model
+    load once per batch rather than once per image.
+    """
+    name = 'pytesseract'
+
+    def __init__(self, config=''):
+        self.config = config
+
+    def image_to_string(self, image):
+        return pytesseract.image_to_string(image, config=self.config)
+
+    def images_to_strings(self, images):
+        if len(images) < 2:
+            return [self.image_to_string(image) for image in images]
+        with tempfile.TemporaryDirectory() as folder:
+            paths = []
+            for i, image in enumerate(images):
+                # Uncompressed, so writing the images costs next to nothing
+                path = os.path.join(folder, f'{i}.bmp')
+                as_pil(image).save(path)
+                paths.append(path)
+            list_path = os.path.join(folder, 'images.txt')
+            with open(list_path, 'w', encoding='utf-8') as f:
+                f.write('\n'.join(paths) + '\n')
+            result = subprocess.run([pytesseract.pytesseract.tesseract_cmd, list_path, 'stdout',
+                                     *shlex.split(self.config)], capture_output=True)
+        if result.returncode != 0:
+            raise pytesseract.TesseractError(result.returncode, result.stderr.decode('utf-8', 'replace'))
+        # Tesseract ends the text of every image with a form feed
+        texts = result.stdout.decode('utf-8').split('\f')[:-1]
+        if len(texts) != len(images):
+            logging.warning(f"tesseract returned {len(texts)} texts for {len(images)} images; OCRing them one by one")
+            return [self.image_to_string(image) for image in images]
+        return texts
+
+    def close(self):
+        pass
+
+class TesserocrEngine:
+    """Keeps one Tesseract instance with its language model loaded and hands it images in memory."""
+    name = 'tesserocr'
+
+    def __init__(self, config='', tessdata_path=None):
+        lang, psm, oem = parse_config(config)
+        tessdata_path = tessdata_path or default_tessdata_path()
+        if tessdata_path:
+            self.api = tesserocr.PyTessBaseAPI(path=tessdata_path, lang=lang, psm=psm, oem=oem)
+        else:
+            self.api = tesserocr.PyTessBaseAPI(lang=lang, psm=psm, oem=oem)
+
+    def image_to_string(self, image):
+        self.api.SetImage(as_pil(image))
+        return self.api.GetUTF8Text()
+
+    def images_to_strings(self, images):
+        return [self.image_to_string(image) for image in images]
+
+    def close(self):
+        self.api.End()
+
+# One engine per config and thread, kept for the life of the process. A Tesseract
+# instance can only work on one image at a time, so threads never share one.
+_local = threading.local()
+_all_engines = []
+_all_engines_lock = threading.Lock()
+
+def get_engine(config=''):
+    """Return this thread's long-lived engine for a config, creating it on first use."""
+    engines = getattr(_local, 'engines', None)
+    if engines is None:
+        engines = _local.engines = {}
+    engine = engines.get(config)
+    if engine is None:
+        use_tesserocr = ENGINE == 'tesserocr' or (ENGINE == 'auto' and tesserocr is not None)
+        engine = TesserocrEngine(config) if use_tesserocr else PytesseractEngine(config)
+        logging.debug(f"Using {engine.name} OCR engine for config '{config}'")
+        engines[config] = engine
+        with _all_engines_lock:
+            _all_engines.append(engine)
+    return engine
+
+def image_to_string(image, config=''):
+    """Drop-in replacement for pytesseract.image_to_string that reuses a persistent engine."""
+    return get_engine(config).image_to_string(image)
+
+def images_to_strings(images, config=''):
+    """Return the text of each of a list of images, OCRing them as one batch where the engine can."""
+    return get_engine(config).images_to_strings(list(images))
+
+@atexit.register
+def close_engines():
+    """Shut down every engine started by this process."""
+    with _all_engines_lock:
+        for engine in _all_engines:
+            engine.close()
+        _all_engines.clear()
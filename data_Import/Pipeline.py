@@ -0,0 +1,200 @@
+import argparse
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+import Dedup
+import Formatter
+import ImgTest3
+import IncrementalIngest
+import Main
+
+# Marks the end of a queue's input
+_DONE = object()
+
+class PipelineStats:
+    """Counters and per-stage time totals shared by the pipeline threads."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = {'scanned': 0, 'skipped': 0, 'ocr': 0, 'failed': 0, 'parsed': 0, 'unparsed': 0, 'written': 0}
+        self.seconds = {'scan': 0.0, 'preprocess': 0.0, 'ocr': 0.0, 'parse': 0.0, 'write': 0.0}
+
+    def add(self, count=None, stage=None, seconds=0.0):
+        with self.lock:
+            if count:
+                self.counts[count] += 1
+            if stage:
+                self.seconds[stage] += seconds
+
+    def log(self, wall_time):
+        logging.info(f"Pipeline finished in {wall_time:.2f}s: " + ", ".join(f"{k} {v}" for k, v in self.counts.items()))
+        for stage, seconds in self.seconds.items():
+            logging.info(f"  {stage}: {seconds:.2f}s")
+
+def scan_images(directory_path, known, legacy, skip, ocr_queue, write_queue, workers, stats):
+    """Find images that need OCR and feed them to the workers, blocking while the workers are behind."""
+    try:
+        with os.scandir(directory_path) as entries:
+            for entry in entries:
+                if not entry.name.endswith(IncrementalIngest.IMAGE_EXTENSIONS) or entry.name in skip:
+                    continue
+                start = time.perf_counter()
+                try:
+                    action, row = IncrementalIngest.classify_image(entry.name, entry.path, known, legacy)
+                except OSError as e:
+                    # Deleted or unreadable since the directory was listed; the other images still go ahead
+                    logging.error(f"Error reading {entry.path}, skipping it: {e}")
+                    stats.add('failed', 'scan', time.perf_counter() - start)
+                    continue
+                stats.add('scanned', 'scan', time.perf_counter() - start)
+                if action == 'skip':
+                    stats.add('skipped')
+                elif action == 'record':
+                    write_queue.put(('record', row))
+                else:
+                    ocr_queue.put(row)
+    except Exception as e:
+        logging.error(f"Error scanning {directory_path}: {e}")
+    finally:
+        for _ in range(workers):
+            ocr_queue.put(_DONE)
+
+def ocr_worker(ocr_queue, write_queue, parse_function, stats):
+    """Decode, preprocess, OCR and parse images until the scanner is done.
+
+    _DONE is passed on to the writer however the worker ends, so it never waits forever.
+    """
+    try:
+        while True:
+            job = ocr_queue.get()
+            if job is _DONE:
+                return
+            try:
+                ocr_job(job, write_queue, parse_function, stats)
+            except Exception as e:
+                logging.error(f"Error processing image {job[1]}: {e}")
+    finally:
+        write_queue.put(_DONE)
+
+def ocr_job(job, write_queue, parse_function, stats):
+    image_path = job[1]
+    try:
+        text, preprocess_time, ocr_time = ImgTest3.ocr_image(image_path)
+    except Exception as e:
+        logging.error(f"Error processing image {image_path}: {e}")
+        text, preprocess_time, ocr_time = None, 0.0, 0.0
+    stats.add(None, 'preprocess', preprocess_time)
+    stats.add('ocr', 'ocr', ocr_time)
+    if text is None:
+        stats.add('failed')
+        return
+
+    start = time.perf_counter()
+    try:
+        parsed = parse_function(text)
+        stats.add('parsed')
+    except Exception as e:
+        logging.debug(f"Could not parse {image_path}: {e}")
+        parsed = None
+        stats.add('unparsed')
+    stats.add(None, 'parse', time.perf_counter() - start)
+    write_queue.put(('ocr', (job, text, parsed)))
+
+def write_batch(conn, batch, stats):
+    """Write a batch of tracking rows and OCR results in one transaction."""
+    start = time.perf_counter()
+    cleaned_rows = []
+    with conn:
+        for kind, payload in batch:
+            if kind == 'record':
+                IncrementalIngest.record_image_file(conn, *payload)
+                continue
+            (filename, _, content_hash, mtime, size), text, parsed = payload
+            image_id = IncrementalIngest.upsert_image_text(conn, filename, text, content_hash, mtime, size)
+            if parsed:
+                cleaned_rows.append((image_id, *parsed, Formatter.source_hash(text)))
+        Formatter.upsert_cleaned_data(conn, cleaned_rows)
+    stats.add(None, 'write', time.perf_counter() - start)
+    with stats.lock:
+        stats.counts['written'] += len(batch)
+
+def write_results(conn, write_queue, workers, batch_size, flush_interval, stats):
+    """Drain the write queue into the database until every worker is done."""
+    batch = []
+    finished = 0
+    while finished < workers:
+        try:
+            item = write_queue.get(timeout=flush_interval)
+        except queue.Empty:
+            # Nothing arrived for a while, so write what we have rather than hold it back
+            if batch:
+                write_batch(conn, batch, stats)
+                batch = []
+            continue
+        if item is _DONE:
+            finished += 1
+            continue
+        batch.append(item)
+        if len(batch) >= batch_size:
+            write_batch(conn, batch, stats)
+            batch = []
+    if batch:
+        write_batch(conn, batch, stats)
+
+def run_pipeline(directory_path, db_path, workers=None, batch_size=50, queue_size=None, flush_interval=1.0,
+                 parse_function=Formatter.parse_text_column, dedup=False):
+    """Stream new or changed screenshots through OCR and parsing into ImageText and CleanedData.
+
+    A scanner thread, a pool of OCR worker threads and this thread (the only database
+    writer) are connected by bounded queues, so memory use does not grow with the folder
+    size and each image is written soon after it is read. Rows marked fixed in the editor
+    are never overwritten. With dedup=True only one frame per cluster of near-identical
+    screenshots is OCR'd (see Dedup).
+    """
+    workers = workers or os.cpu_count()
+    queue_size = queue_size or workers * 2
+    stats = PipelineStats()
+    start = time.perf_counter()
+    skip = Dedup.dedup_images(directory_path, db_path) if dedup else set()
+
+    conn = sqlite3.connect(db_path)
+    try:
+        Main.create_cleaned_data_table(conn)
+        IncrementalIngest.create_image_files_table(conn)
+        known, legacy = IncrementalIngest.load_tracking(conn)
+
+        ocr_queue = queue.Queue(maxsize=queue_size)
+        write_queue = queue.Queue(maxsize=queue_size)
+        threads = [threading.Thread(target=scan_images, daemon=True,
+                                    args=(directory_path, known, legacy, skip, ocr_queue, write_queue, workers, stats))]
+        threads += [threading.Thread(target=ocr_worker, daemon=True, args=(ocr_queue, write_queue, parse_function, stats))
+                    for _ in range(workers)]
+        for thread in threads:
+            thread.start()
+
+        write_results(conn, write_queue, workers, batch_size, flush_interval, stats)
+        for thread in threads:
+            thread.join()
+    finally:
+        conn.close()
+
+    stats.log(time.perf_counter() - start)
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description="OCR a screenshot folder straight into ImageText and CleanedData.")
+    parser.add_argument('directory', help="folder of screenshots")
+    parser.add_argument('db_path', help="SQLite database to fill")
+    parser.add_argument('--workers', type=int, help="OCR worker threads (default: CPU count)")
+    parser.add_argument('--batch-size', type=int, default=50, help="rows per write transaction")
+    parser.add_argument('--queue-size', type=int, help="maximum items waiting between stages (default: 2 x workers)")
+    parser.add_argument('--dedup', action='store_true', help="skip near-identical duplicate screenshots")
+    args = parser.parse_args()
+    run_pipeline(args.directory, args.db_path, args.workers, args.batch_size, args.queue_size, dedup=args.dedup)
+
+if __name__ == "__main__":
+    main()
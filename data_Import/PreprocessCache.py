@@ -0,0 +1,131 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+
+import numpy as np
+from PIL import Image
+
+import IncrementalIngest
+
+# Default cache location and size limit
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'preprocess_cache')
+MAX_CACHE_BYTES = 500 * 1024 * 1024
+
+class PreprocessCache:
+    """Size-bounded on-disk cache of preprocessed images.
+
+    Entries are keyed by the source image's content hash plus the pipeline name and its
+    exact preprocessing parameters, so changing any parameter misses the cache. Images are
+    stored as PNG, 1 bit per pixel when the image is binarized. The least recently used
+    entries are evicted once the cache grows past max_bytes.
+
+    Creating one is free: the folder is only created and scanned for its size on the
+    first put(), so scripts and worker processes can build one at import time. One
+    instance can be shared by threads.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        # Bytes of cached PNGs, counted on the first put(); guarded by _lock with eviction
+        self.total_bytes = None
+        self._lock = threading.Lock()
+
+    def key(self, content_hash, pipeline, params):
+        """Return the cache key for a source image hash, pipeline name and parameter dict."""
+        spec = json.dumps([content_hash, pipeline, params], sort_keys=True)
+        return hashlib.sha256(spec.encode('utf-8')).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, key + '.png')
+
+    def get(self, key):
+        """Return the cached greyscale PIL image for a key, or None on a miss."""
+        path = self.path(key)
+        try:
+            img = Image.open(path)
+            img.load()
+        except (FileNotFoundError, OSError):
+            return None
+        # Touch the file so eviction treats it as recently used. Best effort: another
+        # process may have evicted it since it was read.
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return img.convert('L')
+
+    def put(self, key, image):
+        """Store a preprocessed PIL image or numpy array under a key."""
+        if not isinstance(image, Image.Image):
+            image = Image.fromarray(image)
+        image = image.convert('L')
+        colors = image.getcolors(2)
+        if colors and all(value in (0, 255) for _, value in colors):
+            image = image.convert('1', dither=Image.Dither.NONE)
+
+        path = self.path(key)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # Write to a temp file first so other threads and processes never read a half-written entry
+        fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=self.cache_dir)
+        try:
+            with os.fdopen(fd, 'wb') as tmp_file:
+                image.save(tmp_file, 'PNG', optimize=True)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        size = os.path.getsize(path)
+        with self._lock:
+            if self.total_bytes is None:
+                # The scan already counts the entry just written
+                self.total_bytes = self._scan_size()
+            else:
+                self.total_bytes += size
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+
+    def _scan_size(self):
+        return sum(entry.stat().st_size for entry in os.scandir(self.cache_dir) if entry.name.endswith('.png'))
+
+    def evict(self):
+        """Delete least recently used entries until the cache is below 90% of max_bytes."""
+        with self._lock:
+            self._evict()
+
+    def _evict(self):
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith('.png'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        entries.sort()
+        self.total_bytes = sum(size for _, size, _ in entries)
+        target = self.max_bytes * 0.9
+        for _, size, path in entries:
+            if self.total_bytes <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self.total_bytes -= size
+        logging.debug(f"Preprocess cache evicted down to {self.total_bytes} bytes")
+
+    def get_or_create(self, image_path, pipeline, params, preprocess, as_array=False):
+        """Return the preprocessed image for image_path, running preprocess(image_path) on a miss.
+
+        Cache hits come back as a PIL image, or a numpy array with as_array=True, to match
+        what preprocess returns. Returns None (and caches nothing) if preprocess fails.
+        """
+        key = self.key(IncrementalIngest.file_hash(image_path), pipeline, params)
+        img = self.get(key)
+        if img is not None:
+            return np.array(img) if as_array else img
+        img = preprocess(image_path)
+        if img is not None:
+            self.put(key, img)
+        return img
@@ -0,0 +1,66 @@
+import math
+import os
+import statistics
+import time
+
+import cv2
+import numpy as np
+
+import Main
+
+def legacy_detect_colored_boxes(img):
+    """The original four-mask, RETR_TREE segmentation, kept as the baseline to compare against."""
+    hsv_img = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
+    blue_mask = cv2.inRange(hsv_img, np.array([100, 100, 100]), np.array([140, 255, 255]))
+    green_mask = cv2.inRange(hsv_img, np.array([35, 100, 100]), np.array([85, 255, 255]))
+    red_mask1 = cv2.inRange(hsv_img, np.array([0, 100, 100]), np.array([10, 255, 255]))
+    red_mask2 = cv2.inRange(hsv_img, np.array([160, 100, 100]), np.array([180, 255, 255]))
+    red_mask = cv2.bitwise_or(red_mask1, red_mask2)
+    contours_blue, _ = cv2.findContours(blue_mask, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
+    contours_green, _ = cv2.findContours(green_mask, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
+    contours_red, _ = cv2.findContours(red_mask, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
+    return contours_blue, contours_green, contours_red
+
+def time_per_image(detect, images, repeat=3):
+    """Return the best-of-repeat seconds detect() took on each image."""
+    timings = []
+    for img in images:
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            detect(img)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        timings.append(best)
+    return timings
+
+def main(directory_path, limit=None):
+    filenames = sorted(f for f in os.listdir(directory_path) if f.endswith(('.png', '.jpg', '.jpeg')))[:limit]
+    images = [cv2.imread(os.path.join(directory_path, filename)) for filename in filenames]
+    images = [img for img in images if img is not None]
+    if not images:
+        print(f"No images found in {directory_path}")
+        return
+
+    variants = [
+        ('legacy', legacy_detect_colored_boxes),
+        ('label map 1.0', lambda img: Main.find_colored_boxes(img, 1.0)),
+        (f'label map {Main.SEGMENT_SCALE}', lambda img: Main.find_colored_boxes(img, Main.SEGMENT_SCALE)),
+    ]
+    print(f"{len(images)} images of {images[0].shape[1]}x{images[0].shape[0]}")
+    print(f"{'variant':<16} {'mean ms':>9} {'median ms':>10} {'p95 ms':>9} {'speedup':>8}")
+    baseline = None
+    for name, detect in variants:
+        timings = sorted(time_per_image(detect, images))
+        mean = statistics.mean(timings)
+        baseline = baseline or mean
+        p95 = timings[max(0, math.ceil(len(timings) * 0.95) - 1)]
+        print(f"{name:<16} {mean * 1000:>9.2f} {statistics.median(timings) * 1000:>10.2f} "
+              f"{p95 * 1000:>9.2f} {baseline / mean:>7.2f}x")
+
+# Define the directory containing images and how many images to use
+directory_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Source_img')
+limit = None
+
+if __name__ == "__main__":
+    main(directory_path, limit)
@@ -0,0 +1,68 @@
+import os
+import sqlite3
+
+import MergeDatabases
+import Migrations
+
+def make_source(path, questions, content_hashes=None, mtime=None):
+    """Write a question database with (id, filename, text, cleaned_question) rows.
+
+    With content_hashes ({filename: hash}) it also gets the ImageFiles table
+    IncrementalIngest keeps.
+    """
+    conn = sqlite3.connect(path)
+    Migrations.migrate(conn)
+    with conn:
+        for question_id, filename, text, cleaned_question in questions:
+            conn.execute("INSERT INTO ImageText (id, filename, text) VALUES (?, ?, ?)", (question_id, filename, text))
+            conn.execute("INSERT INTO CleanedData (question_id, cleaned_question, answer1, answer2, answer3, answer4) "
+                         "VALUES (?, ?, 'a', 'b', 'c', 'd')", (question_id, cleaned_question))
+        if content_hashes is not None:
+            conn.execute("CREATE TABLE ImageFiles (filename TEXT PRIMARY KEY, image_id INTEGER, "
+                         "content_hash TEXT, mtime REAL, size INTEGER)")
+            conn.executemany("INSERT INTO ImageFiles (filename, content_hash) VALUES (?, ?)", content_hashes.items())
+    conn.close()
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+    return str(path)
+
+def merged_filenames(path):
+    conn = sqlite3.connect(path)
+    try:
+        return sorted(row[0] for row in conn.execute("SELECT filename FROM ImageText"))
+    finally:
+        conn.close()
+
+QUESTIONS = [(1, "one.jpg", "text 1", "Question 1?"), (2, "two.jpg", "text 2", "Question 2?")]
+
+def test_a_source_with_image_files_matches_one_without_by_filename(tmp_path):
+    backup = make_source(tmp_path / "backup.db", QUESTIONS, mtime=1000)
+    ingested = make_source(tmp_path / "ingested.db", QUESTIONS, {"one.jpg": "hash1", "two.jpg": "hash2"}, mtime=2000)
+    output = str(tmp_path / "merged.db")
+
+    report = MergeDatabases.merge_databases([backup, ingested], output)
+
+    assert report["questions"] == 2
+    assert report["identical"] == 2
+    assert merged_filenames(output) == ["one.jpg", "two.jpg"]
+
+def test_a_renamed_file_is_linked_by_content_hash(tmp_path):
+    old = make_source(tmp_path / "old.db", QUESTIONS, {"one.jpg": "hash1", "two.jpg": "hash2"}, mtime=1000)
+    renamed = [(1, "one.jpg", "text 1", "Question 1?"), (2, "two_renamed.jpg", "text 2", "Question 2?")]
+    new = make_source(tmp_path / "new.db", renamed, {"one.jpg": "hash1", "two_renamed.jpg": "hash2"}, mtime=2000)
+    output = str(tmp_path / "merged.db")
+
+    report = MergeDatabases.merge_databases([old, new], output)
+
+    assert report["questions"] == 2
+    assert merged_filenames(output) == ["one.jpg", "two_renamed.jpg"]
+
+def test_copies_of_one_image_in_a_source_stay_separate(tmp_path):
+    copies = make_source(tmp_path / "copies.db", QUESTIONS, {"one.jpg": "same", "two.jpg": "same"}, mtime=1000)
+    backup = make_source(tmp_path / "backup.db", QUESTIONS, mtime=2000)
+    output = str(tmp_path / "merged.db")
+
+    report = MergeDatabases.merge_databases([copies, backup], output)
+
+    assert report["questions"] == 2
+    assert merged_filenames(output) == ["one.jpg", "two.jpg"]
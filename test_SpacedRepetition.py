@@ -0,0 +1,104 @@
+import random
+
+from SpacedRepetition import BOX_INTERVALS, LeitnerScheduler
+
+class FakeClock:
+    """A clock that only moves when the test says so."""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+def make_scheduler(question_ids, progress=(), clock=None, on_change=None):
+    return LeitnerScheduler(question_ids, progress, on_change=on_change, rng=random.Random(0),
+                            clock=clock or FakeClock())
+
+def test_right_answers_move_up_a_box_and_a_wrong_one_back_to_the_first():
+    clock = FakeClock()
+    changes = []
+    scheduler = make_scheduler([1], clock=clock, on_change=lambda *change: changes.append(change))
+
+    assert scheduler.take() == 1
+    assert scheduler.record(1, True) == (1, clock.now + BOX_INTERVALS[1])
+    clock.now += BOX_INTERVALS[1]
+    assert scheduler.take() == 1
+    assert scheduler.record(1, True) == (2, clock.now + BOX_INTERVALS[2])
+    clock.now += BOX_INTERVALS[2]
+    assert scheduler.take() == 1
+    assert scheduler.record(1, False) == (0, clock.now + BOX_INTERVALS[0])
+
+    assert [(box, correct) for _, box, _, correct in changes] == [(1, True), (2, True), (0, False)]
+
+def test_the_top_box_is_the_last():
+    scheduler = make_scheduler([1], progress=[(1, len(BOX_INTERVALS) - 1, 0.0)])
+    assert scheduler.take() == 1
+    assert scheduler.record(1, True)[0] == len(BOX_INTERVALS) - 1
+
+def test_due_questions_come_before_new_ones_and_new_ones_before_early_reviews():
+    clock = FakeClock()
+    scheduler = make_scheduler([1, 2, 3], clock=clock)
+    first = scheduler.take()
+    scheduler.record(first, True)
+
+    # Not due yet, so the new questions come first
+    others = {scheduler.take(), scheduler.take()}
+    assert others == {1, 2, 3} - {first}
+    for question_id in others:
+        scheduler.record(question_id, False)
+
+    # Once nothing new is left the earliest due question comes back, even before it is due
+    assert scheduler.due_count() == 0
+    assert scheduler.take() in others
+
+    clock.now += BOX_INTERVALS[1]
+    assert scheduler.due_count() == 2
+
+def test_a_due_review_comes_before_new_questions():
+    clock = FakeClock()
+    scheduler = make_scheduler([1, 2], progress=[(1, 3, clock.now - 1)], clock=clock)
+    assert scheduler.peek(2) == [1, 2]
+    assert scheduler.take() == 1
+
+def test_release_puts_a_new_question_at_the_end():
+    scheduler = make_scheduler([1, 2, 3])
+    order = [scheduler.take() for _ in range(3)]
+    assert scheduler.take() is None
+    scheduler.release(order[0])
+    assert scheduler.take() == order[0]
+
+def test_release_keeps_the_box_of_a_seen_question_and_lets_due_ones_go_first():
+    clock = FakeClock()
+    scheduler = make_scheduler([1, 2], progress=[(1, 4, clock.now - 10), (2, 2, clock.now - 5)], clock=clock)
+    assert scheduler.take() == 1
+    scheduler.release(1)
+    # The other due question goes first
+    assert scheduler.take() == 2
+    scheduler.record(2, True)
+    # The released one is back after the first interval, still in its box
+    assert scheduler.take() == 1
+    clock.now += BOX_INTERVALS[0]
+    assert scheduler.record(1, True)[0] == 5
+
+def test_restoring_saved_progress():
+    clock = FakeClock()
+    saved = {}
+    scheduler = make_scheduler([1, 2, 3], clock=clock,
+                               on_change=lambda question_id, box, due, correct: saved.update({question_id: (box, due)}))
+    for _ in range(3):
+        question_id = scheduler.take()
+        scheduler.record(question_id, question_id != 2)
+
+    # A new scheduler built from what on_change saved carries on where the last one stopped;
+    # progress for questions no longer in the bank is ignored
+    progress = [(question_id, box, due) for question_id, (box, due) in saved.items()] + [(99, 1, 0.0)]
+    restored = make_scheduler([1, 2, 3, 4], progress=progress, clock=clock)
+    assert len(restored) == 4
+    assert restored.take() == 4
+    clock.now += BOX_INTERVALS[0]
+    assert restored.due_count() == 1
+    assert restored.take() == 2
+    # The other two are not due yet, so the one with the lowest id of the two goes first
+    assert restored.take() == 1
+    assert restored.record(1, True)[0] == 2